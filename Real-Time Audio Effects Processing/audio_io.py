@@ -0,0 +1,244 @@
+import os
+import struct
+
+import numpy as np
+
+from buffers import GrowableBuffer
+from profiling import profiler
+from resample import Resampler, resample_blocks
+from pcm import (decode_pcm, output_channels, storage_dtype, frame_shape, WAVE_FORMAT_PCM,
+                 WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_EXTENSIBLE, CHANNELS_KEEP)
+
+# Frames converted at once when a WAV file is read block by block
+WAV_BLOCK_SIZE = 65536
+# Frames per block handed out by the MP3 decoder
+MP3_BLOCK_SIZE = 16384
+
+
+class WavFile:
+    # Maps the data chunk of a WAV file with np.memmap. Nothing is read when the file
+    # is opened, samples are converted to float32 only for the frames that are sliced
+    # or iterated, so large files open instantly and memory stays bounded.
+    # channels is one of the pcm.CHANNELS_* modes; slices are (frames, channels).
+    def __init__(self, file_path, channels=CHANNELS_KEEP):
+        self.file_path = file_path
+        self.channels = channels
+        fmt, data_offset, data_size = self.read_chunks(file_path)
+        if len(fmt) < 16:
+            raise ValueError("WAV fmt chunk is too short.")
+        format_tag, n_channels, framerate, byte_rate, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            # The real format is the first two bytes of the sub format GUID
+            format_tag = struct.unpack('<H', fmt[24:26])[0]
+        # Compressed formats (mu-law, A-law, ADPCM, ...) would be mapped as garbage
+        if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+            raise ValueError(f"Unsupported WAV format 0x{format_tag:04x}, only PCM and IEEE float can be read.")
+        if n_channels == 0 or block_align % n_channels:
+            raise ValueError("WAV file has an invalid channel count or block size.")
+        self.is_float = format_tag == WAVE_FORMAT_IEEE_FLOAT
+        self.n_channels = n_channels
+        self.framerate = framerate
+        self.sampwidth = block_align // n_channels
+
+        # A recording that was cut short may claim more data than the file holds
+        data_size = min(data_size, os.path.getsize(file_path) - data_offset)
+        self.n_frames = data_size // block_align
+
+        dtype = storage_dtype(self.sampwidth, self.is_float)
+        shape = frame_shape(self.n_frames, n_channels, self.sampwidth)
+        if self.n_frames > 0:
+            self.samples = np.memmap(file_path, dtype=dtype, mode='r', offset=data_offset, shape=shape)
+        else:
+            self.samples = np.zeros(shape, dtype=dtype)
+
+    @staticmethod
+    def read_chunks(file_path):
+        fmt = None
+        ds64_data_size = None
+        with open(file_path, 'rb') as f:
+            header = f.read(12)
+            if len(header) < 12:
+                raise ValueError("Not a WAV file.")
+            riff, _, wave_id = struct.unpack('<4sI4s', header)
+            if riff not in (b'RIFF', b'RF64') or wave_id != b'WAVE':
+                raise ValueError("Not a WAV file.")
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError("WAV file has no data chunk.")
+                chunk_id, chunk_size = struct.unpack('<4sI', header)
+                if chunk_id == b'fmt ':
+                    fmt = f.read(chunk_size)
+                    f.seek(chunk_size & 1, 1)
+                elif chunk_id == b'ds64':
+                    # RF64 keeps the 64-bit sizes here, the 32-bit fields hold 0xFFFFFFFF
+                    ds64 = f.read(chunk_size)
+                    ds64_data_size = struct.unpack('<Q', ds64[8:16])[0]
+                    f.seek(chunk_size & 1, 1)
+                elif chunk_id == b'data':
+                    if fmt is None:
+                        raise ValueError("WAV file has no fmt chunk.")
+                    if riff == b'RF64' and chunk_size == 0xFFFFFFFF and ds64_data_size is not None:
+                        chunk_size = ds64_data_size
+                    return fmt, f.tell(), chunk_size
+                else:
+                    # Chunks are padded to an even number of bytes
+                    f.seek(chunk_size + (chunk_size & 1), 1)
+
+    def __len__(self):
+        return self.n_frames
+
+    @property
+    def shape(self):
+        return (self.n_frames, output_channels(self.n_channels, self.channels))
+
+    def __getitem__(self, index):
+        return self.to_float(self.samples[index])
+
+    def to_float(self, frames):
+        return decode_pcm(frames, self.sampwidth, self.is_float, self.channels)
+
+    def blocks(self, block_size=WAV_BLOCK_SIZE):
+        for start in range(0, self.n_frames, block_size):
+            yield self[start:start + block_size]
+
+
+class WavWriter:
+    # Writes float32 WAV data as it arrives. The size fields are patched in by
+    # update_header(), so a file cut off by a crash is readable up to the last update.
+    # A JUNK chunk reserves room for the ds64 chunk that turns the file into RF64
+    # once the data no longer fits in 4 GB (EBU Tech 3306).
+    def __init__(self, file_path, fs, n_channels=1):
+        self.file_path = file_path
+        self.n_channels = n_channels
+        self.data_bytes = 0
+        self.f = open(file_path, 'wb')
+        block_align = 4 * n_channels
+        self.f.write(b'RIFF' + struct.pack('<I', 0) + b'WAVE')
+        self.f.write(b'JUNK' + struct.pack('<I', 28) + bytes(28))
+        self.f.write(b'fmt ' + struct.pack('<IHHIIHH', 16, WAVE_FORMAT_IEEE_FLOAT, n_channels, fs,
+                                           fs * block_align, block_align, 32))
+        self.f.write(b'data' + struct.pack('<I', 0))
+        self.data_offset = self.f.tell()
+
+    def write(self, samples):
+        # (frames, n_channels) blocks, stored interleaved
+        samples = np.ascontiguousarray(samples, dtype='<f4')
+        self.f.write(samples)
+        self.data_bytes += samples.nbytes
+
+    def update_header(self):
+        end = self.f.tell()
+        riff_size = self.data_offset + self.data_bytes - 8
+        if riff_size > 0xFFFFFFFF:
+            frames = self.data_bytes // (4 * self.n_channels)
+            self.f.seek(0)
+            self.f.write(b'RF64' + struct.pack('<I', 0xFFFFFFFF))
+            self.f.seek(12)
+            self.f.write(b'ds64' + struct.pack('<IQQQI', 28, riff_size, self.data_bytes, frames, 0))
+            self.f.seek(self.data_offset - 4)
+            self.f.write(struct.pack('<I', 0xFFFFFFFF))
+        else:
+            self.f.seek(4)
+            self.f.write(struct.pack('<I', riff_size))
+            self.f.seek(self.data_offset - 4)
+            self.f.write(struct.pack('<I', self.data_bytes))
+        self.f.seek(end)
+        self.f.flush()
+
+    def close(self):
+        self.update_header()
+        self.f.close()
+
+
+class WavResampler:
+    # Converts a WAV file to another sample rate block by block into a growing buffer,
+    # with the same run()/buffer/fs interface as Mp3Decoder
+    def __init__(self, wav, fs_out):
+        self.wav = wav
+        self.fs = fs_out
+        channels = wav.shape[1]
+        self.resampler = Resampler(wav.framerate, fs_out, channels)
+        self.expected_frames = self.resampler.output_length(len(wav))
+        self.buffer = GrowableBuffer(self.expected_frames, channels=channels)
+
+    def run(self, progress=None):
+        with profiler.stage("convert", fs_in=self.wav.framerate, fs_out=self.fs):
+            for block in resample_blocks(self.wav.blocks(), self.resampler):
+                self.buffer.append(block)
+                if progress is not None:
+                    progress(min(99, 100 * len(self.buffer) // max(1, self.expected_frames)))
+        self.buffer.finish()
+        return self.buffer
+
+
+class Mp3Decoder:
+    # Opening only reads the header, so the sample rate and a buffer sized from the
+    # duration are available at once. run() then decodes into the buffer block by
+    # block (normally on the thread pool) while playback and plotting read from it.
+    # With fs_out set the decoded blocks are resampled on the way into the buffer.
+    def __init__(self, file_path, channels=CHANNELS_KEEP, block_size=MP3_BLOCK_SIZE, fs_out=None):
+        import audioread  # also what librosa used underneath, imported on first use
+
+        self.audio_file = audioread.audio_open(file_path)
+        self.channels = channels
+        self.block_size = block_size
+        self.source_fs = self.audio_file.samplerate
+        self.fs = fs_out or self.source_fs
+        self.n_channels = self.audio_file.channels
+        out_channels = output_channels(self.n_channels, channels)
+        self.resampler = None
+        if self.fs != self.source_fs:
+            self.resampler = Resampler(self.source_fs, self.fs, out_channels)
+        self.expected_frames = int(self.audio_file.duration * self.fs)
+        self.buffer = GrowableBuffer(self.expected_frames + block_size, channels=out_channels)
+
+    def blocks(self):
+        # audioread hands out interleaved int16 buffers of any size, they are
+        # regrouped into block_size frames and decoded like 16-bit WAV data
+        frame_bytes = 2 * self.n_channels
+        chunk_bytes = frame_bytes * self.block_size
+        pending = bytearray()
+        for buf in self.audio_file:
+            pending += buf
+            if len(pending) >= chunk_bytes:
+                usable = len(pending) - len(pending) % chunk_bytes
+                yield from self.decode(bytes(pending[:usable]))
+                del pending[:usable]
+        usable = len(pending) - len(pending) % frame_bytes
+        if usable:
+            yield from self.decode(bytes(pending[:usable]))
+
+    def decode(self, raw_bytes):
+        raw = np.frombuffer(raw_bytes, dtype='<i2').reshape(-1, self.n_channels)
+        decoded = decode_pcm(raw, 2, channels=self.channels)
+        for start in range(0, len(decoded), self.block_size):
+            yield decoded[start:start + self.block_size]
+
+    def run(self, progress=None):
+        blocks = self.blocks()
+        if self.resampler is not None:
+            blocks = resample_blocks(blocks, self.resampler)
+        try:
+            with profiler.stage("decode", fs_in=self.source_fs, fs_out=self.fs):
+                for block in blocks:
+                    self.buffer.append(block)
+                    if progress is not None:
+                        progress(min(99, 100 * len(self.buffer) // max(1, self.expected_frames)))
+        finally:
+            self.audio_file.close()
+        self.buffer.finish()
+        return self.buffer
+
+
+def load_audio(file_path, channels=CHANNELS_KEEP, progress=None):
+    # Returns (samples, fs) without any GUI: WAV files stay memory mapped, MP3s are
+    # decoded completely before returning
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".wav":
+        wav = WavFile(file_path, channels)
+        return wav, wav.framerate
+    if extension == ".mp3":
+        decoder = Mp3Decoder(file_path, channels)
+        return decoder.run(progress).view(), decoder.fs
+    raise ValueError(f"Unsupported file format: {file_path}")
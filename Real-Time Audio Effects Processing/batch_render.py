@@ -0,0 +1,129 @@
+# Renders an effect chain over every WAV and MP3 file in a folder without the GUI,
+# one file per process, and writes the results as float WAV files.
+# Usage: python batch_render.py INPUT_DIR OUTPUT_DIR --effect Echo --effect Reverb:length=1.5,dry_wet=0.4
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from audio_io import WavWriter, load_audio
+from chain import EFFECTS, chain_label, chain_processor
+from pcm import CHANNELS_KEEP, CHANNELS_MIX, CHANNELS_FIRST, channel_count
+from profiling import PeakMemory, format_bytes
+from render import RENDER_BLOCK_SIZE, render_effect
+from resample import Resampler, resample_blocks
+
+AUDIO_EXTENSIONS = (".wav", ".mp3")
+
+
+def parse_effect(spec):
+    # "Name" or "Name:param=value,param=value", values are converted like the slider values
+    name, _, settings = spec.partition(":")
+    if name not in EFFECTS:
+        raise argparse.ArgumentTypeError(f"unknown effect {name!r}, choose from {', '.join(EFFECTS)}")
+    cls = EFFECTS[name]
+    params = {param.name: param for param in cls.params}
+    values = {}
+    for setting in filter(None, settings.split(",")):
+        key, _, value = setting.partition("=")
+        if key not in params:
+            raise argparse.ArgumentTypeError(f"{name} has no parameter {key!r}")
+        values[key] = type(params[key].default)(value)
+    return cls(**values)
+
+
+def find_audio_files(input_dir):
+    return sorted(os.path.join(input_dir, name) for name in os.listdir(input_dir)
+                  if name.lower().endswith(AUDIO_EXTENSIONS))
+
+
+def render_file(input_path, output_path, effects, channels, rate=None):
+    # Runs in a worker process. The output is written block by block as it is
+    # rendered, so memory use does not grow with the file length. Effects that need
+    # the whole buffer (Pitch Shift) are rendered like in the window, without the
+    # latency of their block mode; only then is the input held in memory.
+    start = time.perf_counter()
+    with PeakMemory() as memory:
+        data, fs = load_audio(input_path, channels)
+        duration = len(data) / fs
+        n_channels = channel_count(data)
+        blocks = (data[block_start:block_start + RENDER_BLOCK_SIZE]
+                  for block_start in range(0, len(data), RENDER_BLOCK_SIZE))
+        if rate and rate != fs:
+            blocks = resample_blocks(blocks, Resampler(fs, rate, n_channels))
+            fs = rate
+        # Everything up to the last whole-buffer effect is rendered in memory,
+        # the block effects after it are streamed
+        split = max((index + 1 for index, effect in enumerate(effects) if effect.whole_buffer), default=0)
+        if split:
+            buffer = np.concatenate(list(blocks)) if len(data) else data[:]
+            for effect in effects[:split]:
+                buffer = render_effect(effect, buffer, fs)
+            blocks = (buffer[block_start:block_start + RENDER_BLOCK_SIZE]
+                      for block_start in range(0, len(buffer), RENDER_BLOCK_SIZE))
+        processor = chain_processor(effects[split:], fs, RENDER_BLOCK_SIZE, n_channels)
+        writer = WavWriter(output_path, fs, n_channels)
+        try:
+            for block in blocks:
+                # Resampled blocks can be longer than the processors' block size
+                for block_start in range(0, len(block), RENDER_BLOCK_SIZE):
+                    writer.write(processor.process(block[block_start:block_start + RENDER_BLOCK_SIZE]))
+        finally:
+            writer.close()
+    return duration, time.perf_counter() - start, memory.peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply an effect chain to every audio file in a folder")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--effect", dest="effects", action="append", type=parse_effect, default=[],
+                        help="Effect to apply, in order, e.g. Echo or Reverb:length=1.5 (can be repeated)")
+    parser.add_argument("--channels", choices=(CHANNELS_KEEP, CHANNELS_MIX, CHANNELS_FIRST), default=CHANNELS_KEEP,
+                        help="Keep every channel of the input files or make them mono by mixing or "
+                             "taking the first channel (default: keep)")
+    parser.add_argument("--rate", type=int, default=None,
+                        help="Resample every file to this rate before the effects (default: keep each file's rate)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    if os.path.realpath(args.input_dir) == os.path.realpath(args.output_dir):
+        parser.error("the output folder must not be the input folder")
+    files = find_audio_files(args.input_dir)
+    if not files:
+        parser.error(f"no .wav or .mp3 files in {args.input_dir}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    effects = tuple(args.effects)
+
+    print(f"{len(files)} files, {chain_label(effects)}, {args.workers} workers")
+    print(f"{'file':<40}{'audio s':>10}{'wall s':>10}{'x realtime':>12}{'peak memory':>14}")
+    total_audio = 0.0
+    failures = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {}
+        for input_path in files:
+            name = os.path.splitext(os.path.basename(input_path))[0] + ".wav"
+            output_path = os.path.join(args.output_dir, name)
+            futures[pool.submit(render_file, input_path, output_path, effects, args.channels, args.rate)] = input_path
+        for future in as_completed(futures):
+            name = os.path.basename(futures[future])
+            try:
+                duration, seconds, peak = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"{name:<40} failed: {e}")
+                continue
+            total_audio += duration
+            print(f"{name:<40}{duration:>10.1f}{seconds:>10.2f}{duration / seconds:>12.1f}{format_bytes(peak):>14}")
+    wall = time.perf_counter() - start
+    print(f"{'total':<40}{total_audio:>10.1f}{wall:>10.2f}{total_audio / wall:>12.1f}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# Echo and Reverb convolution of a multichannel signal: scipy.signal.fftconvolve[:n]
+# against convolution.convolve (automatic method) and block-wise streaming through
+# Convolver, then how the streaming cost grows with the number of channels.
+# Usage: python benchmarks/bench_convolution.py [--seconds 60] [--channels 2] [--repeat 3]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from convolution import Convolver, choose_method, convolve, make_plan
+from effects import ECHO_DELAY, ECHO_GAIN, REVERB_LENGTH, REVERB_DECAY, REVERB_SEED, echo_ir, reverb_irs
+from render import RENDER_BLOCK_SIZE
+from processors import BLOCK_SIZE
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def stream(data, ir, block_size):
+    convolver = Convolver(make_plan(ir, block_size), data.shape[1])
+    out = np.empty(data.shape, dtype=np.float32)
+    for start in range(0, len(data), block_size):
+        out[start:start + block_size] = convolver.process(data[start:start + block_size])
+    return out
+
+
+def reverb(rate, channels):
+    return reverb_irs(rate, int(REVERB_LENGTH * rate), REVERB_DECAY, REVERB_SEED, channels)
+
+
+def main():
+    from scipy.signal import fftconvolve
+
+    parser = argparse.ArgumentParser(description="Effect convolution speed")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--rate", type=int, default=44100)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.uniform(-1, 1, (int(args.seconds * args.rate), args.channels)).astype(np.float32)
+    irs = {
+        "Echo": echo_ir(args.rate, ECHO_DELAY, ECHO_GAIN),
+        "Reverb": reverb(args.rate, args.channels),
+    }
+    print(f"{len(data)} frames x {args.channels} channels, best of {args.repeat}")
+    print(f"{'IR':<8}{'path':<28}{'seconds':>10}{'x realtime':>12}{'max error':>12}")
+    for name, ir in irs.items():
+        columns = ir.reshape(len(ir), -1)
+        baseline, reference = best_time(lambda: fftconvolve(data, columns, axes=0)[:len(data)], args.repeat)
+        print(f"{name:<8}{'scipy fftconvolve[:n]':<28}{baseline:>10.3f}{args.seconds / baseline:>12.0f}{0:>12.1e}")
+        runs = [
+            (f"convolve ({choose_method(ir, len(data))})", lambda: convolve(data, ir)),
+            (f"stream {BLOCK_SIZE}", lambda: stream(data, ir, BLOCK_SIZE)),
+            (f"stream {RENDER_BLOCK_SIZE}", lambda: stream(data, ir, RENDER_BLOCK_SIZE)),
+        ]
+        for label, fn in runs:
+            seconds, result = best_time(fn, args.repeat)
+            error = np.abs(result - reference).max()
+            print(f"{name:<8}{label:<28}{seconds:>10.3f}{args.seconds / seconds:>12.0f}{error:>12.1e}")
+
+    # Streaming Reverb with more channels against the same number of mono streams
+    print(f"\n{'channels':<10}{'seconds':>10}{'vs mono x n':>14}")
+    mono = None
+    for channels in (1, 2, 4, 8):
+        signal = rng.uniform(-1, 1, (len(data), channels)).astype(np.float32)
+        ir = reverb(args.rate, channels)
+        seconds, _ = best_time(lambda: stream(signal, ir, BLOCK_SIZE), args.repeat)
+        if mono is None:
+            mono = seconds
+        print(f"{channels:<10}{seconds:>10.3f}{seconds / (channels * mono):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Decoding throughput of pcm.decode_pcm for every supported WAV format.
+# Usage: python benchmarks/bench_pcm.py [--seconds 60] [--channels 2] [--repeat 5]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pcm import decode_pcm, storage_dtype, frame_shape, CHANNELS_MIX, CHANNELS_FIRST, CHANNELS_KEEP
+
+# (label, sample width in bytes, float)
+FORMATS = [
+    ("uint8", 1, False),
+    ("int16", 2, False),
+    ("int24", 3, False),
+    ("int32", 4, False),
+    ("float32", 4, True),
+]
+
+
+def make_raw(n_frames, n_channels, sampwidth, is_float, rng):
+    shape = frame_shape(n_frames, n_channels, sampwidth)
+    dtype = storage_dtype(sampwidth, is_float)
+    if is_float:
+        return rng.uniform(-1, 1, shape).astype(dtype)
+    info = np.iinfo(dtype)
+    return rng.integers(info.min, info.max, shape, dtype=dtype, endpoint=True)
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WAV PCM decoding throughput")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--rate", type=int, default=44100)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n_frames = int(args.seconds * args.rate)
+    print(f"{n_frames} frames x {args.channels} channels, best of {args.repeat}")
+    print(f"{'format':<10}{'mode':<8}{'MB/s':>10}{'x realtime':>14}")
+    for label, sampwidth, is_float in FORMATS:
+        raw = make_raw(n_frames, args.channels, sampwidth, is_float, rng)
+        for mode in (CHANNELS_MIX, CHANNELS_FIRST, CHANNELS_KEEP):
+            seconds = best_time(lambda: decode_pcm(raw, sampwidth, is_float, mode), args.repeat)
+            print(f"{label:<10}{mode:<8}{raw.nbytes / seconds / 1e6:>10.1f}{args.seconds / seconds:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# Headless benchmark suite: loaders, every effect, the int16 conversion and the
+# waveform/spectrogram overviews on synthetic signals, with wall time, realtime
+# factor (wall time / audio duration) and peak memory per stage. Every stage runs
+# twice: once timed, once under tracemalloc for the peak, since tracing slows every
+# allocation down and would distort the times. Results are saved as
+# JSON and can be compared with an earlier run; the exit status is 1 when a stage got
+# slower than --tolerance allows, so it can be used as a regression check.
+# Usage: python benchmarks/run_benchmarks.py [--durations 10,600,3600] [--rates 44100,48000]
+#            [--channels 2] [--output results.json] [--compare baseline.json] [--tolerance 0.2]
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from audio_io import WavFile, WavResampler, Mp3Decoder
+from chain import EFFECTS
+from pcm import encode_int16
+from profiling import PeakMemory, format_bytes
+from render import render_effect
+from spectrogram import Spectrogram
+from warmup import HEAVY_MODULES, warm_up
+from waveform import PeakPyramid, envelope_line
+
+MP3_ASSET = os.path.join(APP_DIR, "mozart-turkish-march-music-127960.mp3")
+# Samples generated at once for the synthetic signals
+SIGNAL_BLOCK_SIZE = 1 << 20
+# Width of the simulated waveform view and the zoom levels drawn in the draw stage
+DRAW_WIDTH = 1600
+DRAW_ZOOMS = (1, 4, 16, 64, 256)
+
+
+def synthetic_signal(seconds, fs, channels=2, seed=0):
+    # A few tones with a slow tremolo plus noise, generated block by block in float32
+    # as (frames, channels); every channel has its own noise
+    rng = np.random.default_rng(seed)
+    n = int(seconds * fs)
+    out = np.empty((n, channels), dtype=np.float32)
+    for start in range(0, n, SIGNAL_BLOCK_SIZE):
+        t = np.arange(start, min(n, start + SIGNAL_BLOCK_SIZE)) / fs
+        block = 0.3 * np.sin(2 * np.pi * 110 * t) + 0.2 * np.sin(2 * np.pi * 440 * t)
+        block += 0.1 * np.sin(2 * np.pi * 3000 * t) * np.sin(2 * np.pi * 0.5 * t)
+        out[start:start + len(t)] = block[:, np.newaxis] + rng.normal(0, 0.05, (len(t), channels))
+    return out
+
+
+def write_wav(file_path, data, fs):
+    # 16-bit PCM, the most common format the app loads
+    with wave.open(file_path, 'wb') as f:
+        f.setnchannels(data.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(fs)
+        for start in range(0, len(data), SIGNAL_BLOCK_SIZE):
+            f.writeframes(encode_int16(data[start:start + SIGNAL_BLOCK_SIZE]).tobytes())
+
+
+def measure(fn):
+    # (result, wall seconds, peak bytes). The time comes from an untraced run whose
+    # result is dropped right away, the peak and the result from a second, traced run.
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    with PeakMemory() as memory:
+        result = fn()
+    return result, seconds, memory.peak
+
+
+def render_chain(effects, data, fs):
+    # The whole chain keeping only the latest output, like batch_render; holding every
+    # stage would take gigabytes for the long signals
+    for effect in effects:
+        data = render_effect(effect, data, fs)
+    return data
+
+
+def draw(peaks, fs):
+    # What the waveform view does per redraw: one envelope per zoom level, and with
+    # matplotlib installed also the Agg rendering of the line
+    try:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+    except ImportError:
+        canvas = None
+    else:
+        figure = Figure(figsize=(DRAW_WIDTH / 100, 3), dpi=100)
+        canvas = FigureCanvasAgg(figure)
+        ax = figure.add_subplot(111)
+        line, = ax.plot([], [], linewidth=0.8)
+    for zoom in DRAW_ZOOMS:
+        span = max(1, len(peaks) // zoom)
+        start = (len(peaks) - span) // 2
+        t, y = envelope_line(*peaks.envelope(start, start + span, DRAW_WIDTH), fs)
+        if canvas is not None:
+            line.set_data(t, y)
+            ax.set_xlim(start / fs, (start + span) / fs)
+            ax.set_ylim(peaks.min - 0.1, peaks.max + 0.1)
+            canvas.draw()
+
+
+def case_stages(data, fs, wav_path):
+    # (stage, function) pairs run on one synthetic signal
+    other_rate = 48000 if fs != 48000 else 44100
+    stages = [
+        ("load wav", lambda: WavFile(wav_path)[:]),
+        (f"load wav -> {other_rate}", lambda: WavResampler(WavFile(wav_path), other_rate).run().view()),
+    ]
+    for name, cls in EFFECTS.items():
+        stages.append((f"effect {name}", lambda cls=cls: render_effect(cls(), data, fs)))
+    effects = tuple(cls() for cls in EFFECTS.values())
+    stages.append(("effect chain (all)", lambda: render_chain(effects, data, fs)))
+    stages.append(("int16", lambda: encode_int16(data)))
+    stages.append(("peaks", lambda: PeakPyramid(data)))
+    stages.append(("spectrogram", lambda: Spectrogram(data, fs)))
+    return stages
+
+
+def format_case(seconds, fs, channels):
+    if seconds >= 3600 and seconds % 3600 == 0:
+        length = f"{seconds // 3600:.0f}h"
+    elif seconds >= 60 and seconds % 60 == 0:
+        length = f"{seconds // 60:.0f}min"
+    else:
+        length = f"{seconds:g}s"
+    return f"{length}@{fs}x{channels}"
+
+
+def print_result(result):
+    print(f"{result['case']:<18}{result['stage']:<32}{result['seconds']:>10.3f}{result['rtf']:>10.4f}"
+          f"{format_bytes(result['peak_bytes']):>14}")
+
+
+def run_case(seconds, fs, channels, directory):
+    results = []
+    case = format_case(seconds, fs, channels)
+    data = synthetic_signal(seconds, fs, channels)
+    wav_path = os.path.join(directory, f"{case}.wav")
+    write_wav(wav_path, data, fs)
+    try:
+        for stage, fn in case_stages(data, fs, wav_path):
+            output, wall, peak = measure(fn)
+            if stage == "peaks":
+                # The draw stage works on the pyramid just built, like the view does
+                peaks = output
+            del output
+            results.append({"case": case, "stage": stage, "seconds": wall, "rtf": wall / seconds,
+                            "peak_bytes": peak})
+            print_result(results[-1])
+        _, wall, peak = measure(lambda: draw(peaks, fs))
+        results.append({"case": case, "stage": "draw", "seconds": wall, "rtf": wall / seconds, "peak_bytes": peak})
+        print_result(results[-1])
+    finally:
+        os.remove(wav_path)
+    return results
+
+
+def run_mp3(fs):
+    # The bundled MP3, opened, decoded and converted to fs the way the app loads it
+    try:
+        buffer, wall, peak = measure(lambda: Mp3Decoder(MP3_ASSET, fs_out=fs).run())
+    except ImportError:
+        print(f"{'mp3@' + str(fs):<18}skipped, audioread is not installed")
+        return []
+    seconds = len(buffer) / fs
+    result = {"case": f"mp3@{fs}", "stage": "load mp3", "seconds": wall, "rtf": wall / seconds, "peak_bytes": peak}
+    print_result(result)
+    return [result]
+
+
+def compare(results, baseline_path, tolerance):
+    # Prints the change of every stage found in both runs, returns the regressions
+    with open(baseline_path) as f:
+        baseline = {(row["case"], row["stage"]): row for row in json.load(f)["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline_path}")
+    print(f"{'case':<18}{'stage':<32}{'before s':>10}{'after s':>10}{'change':>9}{'before peak':>14}{'after peak':>14}")
+    for row in results:
+        old = baseline.get((row["case"], row["stage"]))
+        if old is None:
+            continue
+        change = row["seconds"] / old["seconds"] - 1 if old["seconds"] else 0.0
+        slower = change > tolerance
+        if slower:
+            regressions.append(row)
+        print(f"{row['case']:<18}{row['stage']:<32}{old['seconds']:>10.3f}{row['seconds']:>10.3f}{change:>+9.0%}"
+              f"{format_bytes(old['peak_bytes']):>14}{format_bytes(row['peak_bytes']):>14}"
+              f"{'  slower' if slower else ''}")
+    return regressions
+
+
+def parse_list(text, kind):
+    return [kind(value) for value in text.split(",") if value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loader, effect and waveform benchmarks")
+    parser.add_argument("--durations", type=lambda text: parse_list(text, float), default=[10, 600, 3600],
+                        help="signal lengths in seconds (default: 10,600,3600)")
+    parser.add_argument("--rates", type=lambda text: parse_list(text, int), default=[44100, 48000],
+                        help="sample rates (default: 44100,48000)")
+    parser.add_argument("--channels", type=int, default=2,
+                        help="channels of the synthetic signals (default: 2)")
+    parser.add_argument("--output", default=time.strftime("benchmarks-%Y%m%d-%H%M%S.json"),
+                        help="JSON file the results are written to")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown reported as a regression (default: 0.2)")
+    args = parser.parse_args()
+
+    # Module imports are startup cost (see startup_report.py), not part of any stage
+    warm_up(HEAVY_MODULES).join()
+
+    print(f"{'case':<18}{'stage':<32}{'seconds':>10}{'RTF':>10}{'peak memory':>14}")
+    results = []
+    for fs in args.rates:
+        results += run_mp3(fs)
+    with tempfile.TemporaryDirectory() as directory:
+        for seconds in args.durations:
+            for fs in args.rates:
+                results += run_case(seconds, fs, args.channels, directory)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} stages are more than {args.tolerance:.0%} slower")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# Startup import time of main.py, built from `python -X importtime`.
+# Usage: python benchmarks/startup_report.py [--window] [--top 15] [--max-ms 1500]
+#
+# Exits with status 1 when startup takes longer than --max-ms or when one of the
+# lazily loaded modules (see warmup.HEAVY_MODULES) is imported at startup, so it
+# can be run as a regression check.
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from warmup import HEAVY_MODULES
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+IMPORT_ONLY = "import main"
+WITH_WINDOW = ("import sys, main; from PyQt5.QtWidgets import QApplication; "
+               "app = QApplication(sys.argv); window = main.AudioApp(); window.show(); app.processEvents()")
+
+
+def run_importtime(code):
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=APP_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        sys.exit(result.returncode)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, len(indent) // 2, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup import time report")
+    parser.add_argument("--window", action="store_true", help="also construct and show the main window")
+    parser.add_argument("--top", type=int, default=15, help="number of top level imports to list")
+    parser.add_argument("--max-ms", type=float, default=None, help="fail when startup imports take longer")
+    args = parser.parse_args()
+
+    rows = run_importtime(WITH_WINDOW if args.window else IMPORT_ONLY)
+    # Top level imports are the ones with the smallest indentation
+    top_level = [row for row in rows if row[1] == 0]
+    total_ms = sum(row[3] for row in top_level) / 1000
+
+    print(f"{'module':<40}{'self ms':>10}{'cumulative ms':>16}")
+    for name, _, self_us, cumulative_us in sorted(top_level, key=lambda row: -row[3])[:args.top]:
+        print(f"{name:<40}{self_us / 1000:>10.1f}{cumulative_us / 1000:>16.1f}")
+    print(f"{'total':<40}{'':>10}{total_ms:>16.1f}")
+
+    imported = {row[0] for row in rows}
+    eager = [name for name in HEAVY_MODULES if name in imported]
+    failed = False
+    if eager:
+        print("Imported at startup although they should be lazy: " + ", ".join(eager))
+        failed = True
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"Startup imports took {total_ms:.0f} ms, limit is {args.max_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
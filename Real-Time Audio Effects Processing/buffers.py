@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class GrowableBuffer:
+    # Float32 (frames, channels) buffer that one thread appends to while other threads
+    # read the frames written so far. When it is full the capacity doubles; readers
+    # that sliced the old array keep a valid view of it.
+    def __init__(self, capacity=65536, dtype=np.float32, channels=1):
+        self.data = np.empty((max(1, capacity), channels), dtype=dtype)
+        self.length = 0
+        # Set once the writer is done, until then len() may still grow
+        self.complete = False
+
+    def append(self, block):
+        end = self.length + len(block)
+        if end > len(self.data):
+            grown = np.empty((max(end, 2 * len(self.data)),) + self.data.shape[1:], dtype=self.data.dtype)
+            grown[:self.length] = self.data[:self.length]
+            self.data = grown
+        self.data[self.length:end] = block
+        # Published only after the samples are in place
+        self.length = end
+
+    def finish(self):
+        self.complete = True
+
+    def view(self):
+        # Length first: any array that is current afterwards holds at least that many frames
+        length = self.length
+        return self.data[:length]
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def shape(self):
+        return (self.length,) + self.data.shape[1:]
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    @property
+    def nbytes(self):
+        return self.length * self.data[:1].nbytes
+
+
+class RingBuffer:
+    # Single producer, single consumer ring of float32 frames. The audio callback
+    # writes with at most two slice assignments and never allocates; another thread
+    # drains it. Each side only moves its own counter, so no lock is needed.
+    # Frames that do not fit are dropped and counted in overruns.
+    def __init__(self, capacity, channels=1, dtype=np.float32):
+        self.data = np.zeros((capacity, channels), dtype=dtype)
+        self.capacity = capacity
+        self.written = 0  # total frames written, only changed by the producer
+        self.read = 0     # total frames read, only changed by the consumer
+        self.overruns = 0
+
+    def write(self, samples):
+        n = len(samples)
+        free = self.capacity - (self.written - self.read)
+        if n > free:
+            self.overruns += n - free
+            n = free
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        if first < n:
+            self.data[:n - first] = samples[first:n]
+        self.written += n
+
+    def drain(self, append):
+        # Hands the available samples to append() as up to two views, then frees them
+        available = self.written - self.read
+        if available == 0:
+            return 0
+        start = self.read % self.capacity
+        first = min(available, self.capacity - start)
+        append(self.data[start:start + first])
+        if first < available:
+            append(self.data[:available - first])
+        self.read += available
+        return available
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+# Default memory budget for rendered buffers
+DEFAULT_CACHE_BUDGET = 512 * 1024 * 1024
+
+
+class ProcessedCache:
+    # Least recently used cache for rendered buffers, bounded by the total size of the
+    # stored arrays instead of the number of entries.
+    def __init__(self, max_bytes=DEFAULT_CACHE_BUDGET):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.discard(key)
+        nbytes = getattr(value, "nbytes", 0)
+        # A single buffer bigger than the whole budget is handed back without keeping it
+        if nbytes > self.max_bytes:
+            return value
+        if hasattr(value, "setflags"):
+            value.setflags(write=False)
+        self.entries[key] = value
+        self.total_bytes += nbytes
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= getattr(evicted, "nbytes", 0)
+        return value
+
+    def get_or_render(self, key, render):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, render())
+        return value
+
+    def discard(self, key):
+        value = self.entries.pop(key, None)
+        if value is not None:
+            self.total_bytes -= getattr(value, "nbytes", 0)
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
@@ -0,0 +1,176 @@
+from collections import namedtuple
+
+from effects import (ECHO_DELAY, ECHO_GAIN, BASS_CUTOFF, BASS_ORDER, REVERB_LENGTH, REVERB_DECAY,
+                     REVERB_SEED, REVERB_DRY_WET, PITCH_SHIFT_SEMITONES, reverb_irs)
+from pitch import pitch_shift
+from processors import (BLOCK_SIZE, OriginalProcessor, ChainProcessor, EchoProcessor, BassProcessor,
+                        ReverbProcessor, PitchShiftProcessor)
+
+
+class Param(namedtuple("Param", "name label minimum maximum default step")):
+    # One adjustable parameter. Sliders move in steps of `step` between minimum and maximum.
+    def steps(self):
+        return round((self.maximum - self.minimum) / self.step)
+
+    def index(self, value):
+        return round((value - self.minimum) / self.step)
+
+    def value(self, index):
+        value = self.minimum + index * self.step
+        # Rounded so the same slider position always gives the same cache key
+        if isinstance(self.step, int):
+            return int(value)
+        return round(value, 6)
+
+
+# Effect classes by name, in the order they appear in the menu and the buttons
+EFFECTS = {}
+
+
+def register_effect(cls):
+    EFFECTS[cls.name] = cls
+    return cls
+
+
+class Effect:
+    # An effect with fixed parameter values. Instances are never modified, a new value
+    # gives a new instance, so key() can go into cache keys and an effect handed to a
+    # render thread cannot change under it.
+    name = None
+    params = ()
+    # Effects with a better whole-buffer path than running the processor over blocks
+    # set this and implement render()
+    whole_buffer = False
+
+    def __init__(self, **values):
+        self.values = {param.name: param.default for param in self.params}
+        for name, value in values.items():
+            if name not in self.values:
+                raise ValueError(f"{self.name} has no parameter {name!r}")
+            self.values[name] = value
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def replace(self, **values):
+        return type(self)(**dict(self.values, **values))
+
+    def key(self):
+        return (self.name, tuple(sorted(self.values.items())))
+
+    def processor(self, fs, block_size=BLOCK_SIZE, channels=1):
+        raise NotImplementedError
+
+    def render(self, data, fs, progress=None):
+        raise NotImplementedError
+
+
+@register_effect
+class Echo(Effect):
+    name = "Echo"
+    params = (
+        Param("delay", "Delay (s)", 0.01, 1.0, ECHO_DELAY, 0.01),
+        Param("gain", "Gain", 0.0, 1.0, ECHO_GAIN, 0.05),
+    )
+
+    def processor(self, fs, block_size=BLOCK_SIZE, channels=1):
+        return EchoProcessor(fs, self["delay"], self["gain"], block_size=block_size, channels=channels)
+
+
+@register_effect
+class Bass(Effect):
+    name = "Bass"
+    params = (
+        Param("cutoff", "Cutoff (Hz)", 50.0, 5000.0, BASS_CUTOFF, 10.0),
+        Param("order", "Order", 1, 8, BASS_ORDER, 1),
+    )
+
+    def processor(self, fs, block_size=BLOCK_SIZE, channels=1):
+        return BassProcessor(fs, self["cutoff"], self["order"], channels=channels)
+
+
+@register_effect
+class Reverb(Effect):
+    name = "Reverb"
+    params = (
+        Param("length", "Length (s)", 0.1, 3.0, REVERB_LENGTH, 0.1),
+        Param("decay", "Decay", 0.0, 0.99, REVERB_DECAY, 0.01),
+        Param("dry_wet", "Dry/Wet", 0.0, 1.0, REVERB_DRY_WET, 0.05),
+        Param("seed", "Room", 0, 99, REVERB_SEED, 1),
+    )
+
+    def processor(self, fs, block_size=BLOCK_SIZE, channels=1):
+        ir = reverb_irs(fs, int(self["length"] * fs), self["decay"], self["seed"], channels)
+        return ReverbProcessor(ir, block_size=block_size, dry_wet=self["dry_wet"], channels=channels)
+
+
+@register_effect
+class PitchShift(Effect):
+    # TD-PSOLA. Renders reuse the pitch marks of their input, so moving the slider
+    # only redoes the overlap-add; playback runs the block mode.
+    name = "Pitch Shift"
+    params = (
+        Param("semitones", "Shift (semitones)", -12, 12, PITCH_SHIFT_SEMITONES, 1),
+    )
+    whole_buffer = True
+
+    def processor(self, fs, block_size=BLOCK_SIZE, channels=1):
+        return PitchShiftProcessor(fs, self["semitones"], channels)
+
+    def render(self, data, fs, progress=None):
+        return pitch_shift(data, fs, self["semitones"], progress=progress)
+
+
+def chain_key(effects):
+    return tuple(effect.key() for effect in effects)
+
+
+def chain_label(effects):
+    return " + ".join(effect.name for effect in effects) or "Original"
+
+
+def chain_processor(effects, fs, block_size=BLOCK_SIZE, channels=1):
+    if not effects:
+        return OriginalProcessor()
+    return ChainProcessor(effect.processor(fs, block_size, channels) for effect in effects)
+
+
+class EffectChain:
+    # Effects applied one after another, stage i gets the output of stage i - 1.
+    # `effects` is a tuple that is replaced on every change, so a snapshot of it
+    # stays valid while the chain is edited.
+    def __init__(self):
+        self.effects = ()
+
+    def __len__(self):
+        return len(self.effects)
+
+    def __iter__(self):
+        return iter(self.effects)
+
+    def index(self, name):
+        for index, effect in enumerate(self.effects):
+            if effect.name == name:
+                return index
+        return None
+
+    def add(self, name, **values):
+        self.effects += (EFFECTS[name](**values),)
+
+    def remove(self, index):
+        self.effects = self.effects[:index] + self.effects[index + 1:]
+
+    def toggle(self, name):
+        index = self.index(name)
+        if index is None:
+            self.add(name)
+        else:
+            self.remove(index)
+
+    def set_value(self, index, name, value):
+        effects = list(self.effects)
+        effects[index] = effects[index].replace(**{name: value})
+        self.effects = tuple(effects)
+
+    def clear(self):
+        self.effects = ()
@@ -0,0 +1,225 @@
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# IRs with at most this many non-zero taps are applied as delayed, scaled copies
+SPARSE_MAX_TAPS = 16
+# Dense IRs up to this length are cheaper in the time domain than through an FFT
+DIRECT_MAX_LENGTH = 64
+# Offline overlap-add: segment length relative to the IR, and segments per FFT batch
+OLA_BLOCK_FACTOR = 8
+OLA_BATCH = 32
+
+SPARSE = "sparse"
+DIRECT = "direct"
+FFT = "fft"
+OLA = "ola"
+PARTITIONED = "partitioned"
+
+
+def next_pow2(n):
+    return 1 << max(0, int(n) - 1).bit_length()
+
+
+def ir_columns(ir):
+    # IRs are (taps,) shared by every channel or (taps, channels) with one per channel
+    ir = np.asarray(ir, dtype=np.float32)
+    return ir.reshape(len(ir), -1)
+
+
+def choose_method(ir, n=None):
+    # n is the length of the whole input for offline convolution, None for streaming
+    taps = np.count_nonzero(ir_columns(ir).any(axis=1))
+    if taps <= SPARSE_MAX_TAPS:
+        return SPARSE
+    if len(ir) <= DIRECT_MAX_LENGTH:
+        return DIRECT
+    if n is None:
+        return PARTITIONED
+    # One transform over everything, unless the input is much longer than the IR
+    if n <= OLA_BLOCK_FACTOR * len(ir):
+        return FFT
+    return OLA
+
+
+class ConvolutionPlan:
+    # Everything about an IR that does not depend on the input: the chosen method, the
+    # sparse taps or the spectra of its partitions. Plans are shared, the per-stream
+    # state lives in Convolver. Everything is float32/complex64 like the audio itself.
+    # self.ir is (taps, 1) for an IR shared by all channels, (taps, channels) otherwise.
+    def __init__(self, ir, block_size):
+        self.ir = ir_columns(ir)
+        self.block_size = block_size
+        self.method = choose_method(self.ir)
+        if self.method == SPARSE:
+            self.delays = np.flatnonzero(self.ir.any(axis=1))
+            # One row of per-channel gains per delay
+            self.gains = self.ir[self.delays]
+        elif self.method == PARTITIONED:
+            # Uniform partitions of block_size samples, each transformed once
+            # scipy.fft keeps float32 input in single precision, numpy.fft always uses float64
+            from scipy.fft import rfft, irfft
+            self.rfft = rfft
+            self.irfft = irfft
+            self.n_fft = 2 * block_size
+            n_parts = -(-len(self.ir) // block_size)
+            padded = np.zeros((n_parts * block_size, self.ir.shape[1]), dtype=np.float32)
+            padded[:len(self.ir)] = self.ir
+            # (partitions, bins, channels)
+            self.spectra = rfft(padded.reshape(n_parts, block_size, -1), n=self.n_fft, axis=1)
+            self.spectra.setflags(write=False)
+
+
+@lru_cache(maxsize=32)
+def cached_plan(ir_bytes, shape, block_size):
+    return ConvolutionPlan(np.frombuffer(ir_bytes, dtype=np.float32).reshape(shape), block_size)
+
+
+def make_plan(ir, block_size):
+    # Keyed by content, so the same IR at the same block size is only analysed once
+    ir = np.ascontiguousarray(ir, dtype=np.float32)
+    return cached_plan(ir.tobytes(), ir.shape, block_size)
+
+
+class Convolver:
+    # Streaming convolution of (frames, channels) blocks: process() takes blocks of at
+    # most block_size frames and returns exactly as many output frames, the tail is
+    # carried to the next block. All channels go through the same array operations,
+    # one FFT call per block for the partitioned method, so a second channel costs
+    # much less than a second Convolver.
+    def __init__(self, plan, channels=1):
+        self.plan = plan
+        self.channels = channels
+        if plan.ir.shape[1] not in (1, channels):
+            raise ValueError(f"An IR with {plan.ir.shape[1]} channels cannot filter {channels} channels.")
+        self.reset()
+
+    def reset(self):
+        plan = self.plan
+        if plan.method == PARTITIONED:
+            self.input_buffer = np.zeros((plan.n_fft, self.channels), dtype=np.float32)
+            self.history = np.zeros(plan.spectra.shape[:2] + (self.channels,), dtype=plan.spectra.dtype)
+            self.head = 0
+        else:
+            self.history = np.zeros((len(plan.ir) - 1, self.channels), dtype=np.float32)
+
+    def process(self, block):
+        if self.plan.method == SPARSE:
+            return self.process_sparse(block)
+        if self.plan.method == DIRECT:
+            return self.process_direct(block)
+        return self.process_partitioned(block)
+
+    def process_sparse(self, block):
+        n = len(block)
+        m = len(self.history)
+        signal = np.concatenate((self.history, block))
+        out = np.zeros((n, self.channels), dtype=np.float32)
+        for delay, gain in zip(self.plan.delays, self.plan.gains):
+            out += gain * signal[m - delay:m - delay + n]
+        self.history = signal[n:]
+        return out
+
+    def process_direct(self, block):
+        # Every output frame is the dot product of its window with the reversed IR
+        signal = np.concatenate((self.history, block))
+        self.history = signal[len(block):]
+        m = len(self.plan.ir)
+        windows = sliding_window_view(signal, m, axis=0)
+        ir = np.broadcast_to(self.plan.ir[::-1], (m, self.channels))
+        return np.einsum('ncm,mc->nc', windows, ir)
+
+    def process_partitioned(self, block):
+        # Overlap-save with a frequency-domain delay line of past input spectra
+        plan = self.plan
+        n = len(block)
+        size = plan.block_size
+        self.input_buffer[:size] = self.input_buffer[size:]
+        self.input_buffer[size:size + n] = block
+        self.input_buffer[size + n:] = 0.0
+
+        # Newest spectrum goes in front of the delay line, oldest falls off the end
+        self.head = (self.head - 1) % len(self.history)
+        self.history[self.head] = plan.rfft(self.input_buffer, axis=0)
+        order = (self.head + np.arange(len(self.history))) % len(self.history)
+        # A shared IR is broadcast over the channels without copying its spectra
+        spectra = np.broadcast_to(plan.spectra, self.history.shape)
+        acc = np.einsum('pbc,pbc->bc', self.history[order], spectra)
+        return plan.irfft(acc, n=plan.n_fft, axis=0)[size:size + n]
+
+
+def convolve(data, ir, method=None):
+    # Offline equivalent of scipy.signal.convolve(data, ir)[:len(data)] that never
+    # computes the len(ir) - 1 samples of tail that would be thrown away. data is
+    # (frames, channels), ir is shared or has one column per channel like in
+    # ConvolutionPlan; every transform runs along axis 0 over all channels at once.
+    data = np.asarray(data, dtype=np.float32)
+    if data.ndim == 1:
+        data = data[:, np.newaxis]
+    ir = ir_columns(ir)
+    n = len(data)
+    if method is None:
+        method = choose_method(ir, n)
+    if n == 0:
+        return np.zeros(data.shape, dtype=np.float32)
+    if method == SPARSE:
+        return sparse_convolve(data, ir)
+    if method == DIRECT:
+        return direct_convolve(data, ir)
+    if method == FFT:
+        return fft_convolve(data, ir)
+    return ola_convolve(data, ir)
+
+
+def sparse_convolve(data, ir):
+    n = len(data)
+    out = np.zeros(data.shape, dtype=np.float32)
+    for delay in np.flatnonzero(ir[:n].any(axis=1)):
+        out[delay:] += ir[delay] * data[:n - delay]
+    return out
+
+
+def direct_convolve(data, ir):
+    # np.convolve is 1-D only, the channels are few and the IR is short
+    ir = np.broadcast_to(ir[:len(data)], (min(len(ir), len(data)), data.shape[1]))
+    return np.column_stack([np.convolve(data[:, channel], ir[:, channel])[:len(data)]
+                            for channel in range(data.shape[1])])
+
+
+def fft_convolve(data, ir):
+    from scipy.fft import next_fast_len, rfft, irfft
+
+    n = len(data)
+    ir = ir[:n]
+    # Only the first n outputs are kept, so they must be free of circular wrap-around
+    n_fft = next_fast_len(n + len(ir) - 1, real=True)
+    return irfft(rfft(data, n_fft, axis=0) * rfft(ir, n_fft, axis=0), n_fft, axis=0)[:n]
+
+
+def ola_convolve(data, ir):
+    from scipy.fft import next_fast_len, rfft, irfft
+
+    n, channels = data.shape
+    m = len(ir)
+    block = next_pow2(OLA_BLOCK_FACTOR * m)
+    n_fft = next_fast_len(block + m - 1, real=True)
+    ir_spectrum = rfft(ir, n_fft, axis=0)
+    n_blocks = -(-n // block)
+    out = np.empty((n_blocks * block, channels), dtype=np.float32)
+    padded = np.zeros((n_blocks * block, channels), dtype=np.float32)
+    padded[:n] = data
+    segments = padded.reshape(n_blocks, block, channels)
+    tail = np.zeros((m - 1, channels), dtype=np.float32)
+    # Segments are transformed in batches; each batch adds its own overlaps and
+    # hands the tail of its last segment on to the next batch
+    for first in range(0, n_blocks, OLA_BATCH):
+        batch = segments[first:first + OLA_BATCH]
+        y = irfft(rfft(batch, n_fft, axis=1) * ir_spectrum, n_fft, axis=1)
+        heads = y[:, :block]
+        tails = y[:, block:block + m - 1]
+        heads[1:, :m - 1] += tails[:-1]
+        heads[0, :m - 1] += tail
+        tail = tails[-1]
+        out[first * block:(first + len(batch)) * block] = heads.reshape(-1, channels)
+    return out[:n]
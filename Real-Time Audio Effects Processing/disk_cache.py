@@ -0,0 +1,83 @@
+import glob
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "audio-effects")
+DEFAULT_DISK_CACHE_SIZE = 2 * 1024 * 1024 * 1024
+# Part of every key, bump it when a decoder change alters the samples
+DECODER_VERSION = 2
+
+
+class DecodedCache:
+    # Decoded float32 PCM stored as .npy files and opened again with np.load(mmap_mode='r'),
+    # so a file that was decoded once opens without decoding or copying. Entries are
+    # keyed by path, mtime, size and decoder settings; the file modification time
+    # doubles as the last use time for LRU eviction.
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_DISK_CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, file_path, settings):
+        stat = os.stat(file_path)
+        identity = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, settings, DECODER_VERSION)
+        return hashlib.sha1(repr(identity).encode("utf-8")).hexdigest()
+
+    def load(self, file_path, settings):
+        # Returns (read-only memmap, fs) or None
+        try:
+            matches = glob.glob(os.path.join(self.directory, self.key(file_path, settings) + "_*.npy"))
+            if not matches:
+                return None
+            path = matches[0]
+            fs = int(os.path.basename(path)[:-4].rsplit("_", 1)[1])
+            data = np.load(path, mmap_mode='r')
+            os.utime(path)
+            return data, fs
+        except (OSError, ValueError):
+            return None
+
+    def store(self, file_path, settings, data, fs):
+        # Written to a temporary name first, a crash never leaves a partial entry behind
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{self.key(file_path, settings)}_{fs}.npy")
+            handle, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            try:
+                with os.fdopen(handle, "wb") as f:
+                    np.save(f, np.asarray(data, dtype=np.float32))
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self.evict()
+            return True
+        except OSError:
+            return False
+
+    def evict(self):
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, "*.npy")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.directory, "*.npy")):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
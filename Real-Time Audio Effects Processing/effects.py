@@ -0,0 +1,45 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Default parameters of the effects, see chain.py for their ranges
+ECHO_DELAY = 0.2  # seconds
+ECHO_GAIN = 0.5
+BASS_CUTOFF = 1000.0  # Hz
+BASS_ORDER = 4
+REVERB_LENGTH = 0.5  # seconds
+REVERB_DECAY = 0.8
+REVERB_SEED = 0
+REVERB_DRY_WET = 0.6
+PITCH_SHIFT_SEMITONES = 4
+
+
+@lru_cache(maxsize=16)
+def reverb_ir(fs, length, decay=REVERB_DECAY, seed=REVERB_SEED, channel=0):
+    # ir[i] = ir[i-1] * decay + noise is a one-pole recursion, so the whole IR is a
+    # single lfilter call over seeded noise instead of a Python loop. Each channel
+    # draws its own noise, channel 0 the same as a mono IR.
+    from scipy.signal import lfilter
+
+    rng = np.random.default_rng(seed if channel == 0 else (seed, channel))
+    excitation = rng.normal(0, 0.01, length)
+    excitation[0] = 1.0
+    ir = lfilter([1.0], [1.0, -decay], excitation)
+    # The same array is handed out to every caller, keep it from being modified
+    ir.setflags(write=False)
+    return ir
+
+
+def reverb_irs(fs, length, decay=REVERB_DECAY, seed=REVERB_SEED, channels=1):
+    # (length, channels), one IR per channel. The tails are decorrelated between the
+    # channels of a multichannel source; a mono source gets a single mono IR.
+    return np.column_stack([reverb_ir(fs, length, decay, seed, channel) for channel in range(channels)])
+
+
+def echo_ir(fs, delay, gain):
+    # Two taps: the dry signal and one delayed copy
+    delay_samples = int(delay * fs)
+    ir = np.zeros(delay_samples + 1)
+    ir[0] += 1.0
+    ir[delay_samples] += gain
+    return ir
@@ -0,0 +1,142 @@
+from collections import deque
+
+import numpy as np
+from PyQt5.QtCore import Qt, QLineF, QRectF
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen, qRgb
+from PyQt5.QtWidgets import QWidget
+
+from buffers import RingBuffer
+from spectrogram import STFT_SIZE, SPECTROGRAM_FLOOR_DB, StreamingSTFT
+from waveform import channel_range, reduce_peaks
+
+# Samples summarised by one column of the scrolling waveform
+LIVE_COLUMN_SAMPLES = 256
+# Columns kept on screen, about 3.5 s at 44.1 kHz
+LIVE_COLUMNS = 600
+# Frames a BlockTap holds between two timer ticks, about 1.4 s at 48 kHz
+LIVE_TAP_FRAMES = 65536
+# Meter range in dBFS and how fast the peak hold falls (dB per frame)
+METER_FLOOR_DB = -60.0
+PEAK_HOLD_FALL_DB = 0.5
+
+
+class BlockTap:
+    # Filled from one audio callback: each block is copied into a preallocated
+    # RingBuffer with a slice assignment, so the callback neither allocates nor locks.
+    # The GUI timer drains it and computes levels and spectra on its own thread; the
+    # audio thread never touches Qt, matplotlib or the FFT. Every stream has its own
+    # tap. When the GUI falls behind the newest frames are dropped.
+    def __init__(self, channels, capacity=LIVE_TAP_FRAMES):
+        self.ring = RingBuffer(capacity, channels)
+
+    def push(self, block):
+        self.ring.write(block)
+
+    def drain(self):
+        # Copies, the callback may overwrite the ring as soon as the frames are freed
+        blocks = []
+        self.ring.drain(lambda view: blocks.append(view.copy()))
+        return blocks
+
+
+def to_db(value):
+    return max(METER_FLOOR_DB, 20 * np.log10(max(value, 1e-9)))
+
+
+class LiveView(QWidget):
+    # Scrolling min/max waveform with RMS and peak meters, refreshed by a QTimer
+    # in the main window through refresh(). Painted with QPainter.
+    METER_WIDTH = 12
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(80)
+        self.setMaximumHeight(100)
+        self.reset()
+
+    def reset(self):
+        self.mins = np.zeros(LIVE_COLUMNS, dtype=np.float32)
+        self.maxs = np.zeros(LIVE_COLUMNS, dtype=np.float32)
+        self.rms_db = METER_FLOOR_DB
+        self.peak_db = METER_FLOOR_DB
+        self.peak_hold_db = METER_FLOOR_DB
+        self.update()
+
+    def refresh(self, blocks):
+        # blocks: drained from a BlockTap, each reduced to min/max columns
+        if blocks:
+            columns = [reduce_peaks(*channel_range(block), LIVE_COLUMN_SAMPLES) for block in blocks]
+            self.mins = np.concatenate([self.mins] + [mins for mins, maxs in columns])[-LIVE_COLUMNS:]
+            self.maxs = np.concatenate([self.maxs] + [maxs for mins, maxs in columns])[-LIVE_COLUMNS:]
+            self.rms_db = to_db(float(np.sqrt(np.mean(np.square(blocks[-1], dtype=np.float32)))))
+            self.peak_db = to_db(max(float(max(maxs.max(), -mins.min())) for mins, maxs in columns))
+        else:
+            self.rms_db = METER_FLOOR_DB
+            self.peak_db = METER_FLOOR_DB
+        self.peak_hold_db = max(self.peak_db, self.peak_hold_db - PEAK_HOLD_FALL_DB)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor('#303030'))
+        meters_width = 2 * self.METER_WIDTH + 12
+        width = self.width() - meters_width
+        height = self.height()
+        middle = height / 2
+
+        # Waveform, newest column on the right
+        painter.setPen(QPen(QColor('lime'), 1))
+        x = np.linspace(0, width - 1, LIVE_COLUMNS)
+        top = middle - np.clip(self.maxs, -1, 1) * middle
+        bottom = middle - np.clip(self.mins, -1, 1) * middle
+        painter.drawLines([QLineF(x[i], top[i], x[i], bottom[i]) for i in range(LIVE_COLUMNS)])
+
+        # RMS and peak meters with a falling peak hold line
+        for index, level_db in enumerate((self.rms_db, self.peak_db)):
+            left = width + 6 + index * (self.METER_WIDTH + 2)
+            fraction = (level_db - METER_FLOOR_DB) / -METER_FLOOR_DB
+            painter.fillRect(QRectF(left, 0, self.METER_WIDTH, height), QColor('#404040'))
+            color = QColor('#00b300') if level_db < -12 else QColor('#e0c000') if level_db < -3 else QColor('#e03030')
+            painter.fillRect(QRectF(left, height * (1 - fraction), self.METER_WIDTH, height * fraction), color)
+        hold = height * (1 - (self.peak_hold_db - METER_FLOOR_DB) / -METER_FLOOR_DB)
+        painter.setPen(QPen(Qt.white, 1))
+        painter.drawLine(QLineF(width + 6, hold, width + 6 + 2 * self.METER_WIDTH + 2, hold))
+        painter.end()
+
+
+# 256 step colour table from dark blue through red to yellow for the live spectrogram
+SPECTRUM_COLORS = [qRgb(int(255 * min(1.0, 2 * f)), int(255 * max(0.0, 2 * f - 1)), int(96 * (1 - f)))
+                   for f in np.linspace(0, 1, 256)]
+
+
+class LiveSpectrogram(QWidget):
+    # Scrolling spectrogram of the last LIVE_COLUMNS STFT frames of the blocks drained
+    # from a BlockTap. The dB columns are mapped to 8 bit colour indices and drawn as one QImage.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(80)
+        self.setMaximumHeight(120)
+        self.reset()
+
+    def reset(self):
+        self.levels = np.zeros((LIVE_COLUMNS, STFT_SIZE // 2 + 1), dtype=np.uint8)
+        self.stft = StreamingSTFT()
+        self.update()
+
+    def refresh(self, blocks):
+        items = [self.stft.process(block) for block in blocks]
+        if items:
+            db = np.concatenate(items)[-LIVE_COLUMNS:]
+            levels = np.clip(255 * (1 - db / SPECTROGRAM_FLOOR_DB), 0, 255).astype(np.uint8)
+            self.levels = np.concatenate((self.levels[len(levels):], levels))
+            self.update()
+
+    def paintEvent(self, event):
+        # One image row per frequency bin, low frequencies at the bottom
+        self.image_data = np.ascontiguousarray(self.levels.T[::-1])
+        height, width = self.image_data.shape
+        image = QImage(self.image_data.data, width, height, width, QImage.Format_Indexed8)
+        image.setColorTable(SPECTRUM_COLORS)
+        painter = QPainter(self)
+        painter.drawImage(QRectF(self.rect()), image)
+        painter.end()
@@ -1,52 +1,115 @@
 import sys
-import pygame
-import wave
-import numpy as np
-import sounddevice as sd
-import librosa  # Added for MP3 file support
+import os
+import itertools
+import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QFileDialog, QLabel, QSlider, QMessageBox, 
-                             QMenuBar, QMenu, QAction, QStatusBar, QGroupBox)
-from PyQt5.QtCore import Qt
+                             QMenuBar, QMenu, QAction, QActionGroup, QStatusBar, QGroupBox, QProgressBar,
+                             QTabWidget)
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-from scipy.signal import convolve, butter, lfilter
-from scipy.signal import medfilt
-import psola
+from streaming import StreamPlayer, device_rate
+from chain import EFFECTS, EffectChain, chain_key, chain_label
+from processors import ChainProcessor
+from cache import ProcessedCache, DEFAULT_CACHE_BUDGET
+from render import render_with_overviews
+from waveform_view import WaveformView
+from spectrogram_view import SpectrogramView
+from live_view import BlockTap, LiveView, LiveSpectrogram
+from audio_io import WavFile, WavResampler, Mp3Decoder
+from workers import Task, make_thread_pool
+from pcm import CHANNELS_KEEP, CHANNELS_MIX, CHANNELS_FIRST, channel_count
+from profiling import CallbackStats, format_bytes, profiler, write_profile, write_chrome_trace
+from warmup import warm_up
+from recorder import Recorder, DEFAULT_RECORDINGS_DIR, input_channels
+from disk_cache import DecodedCache, DEFAULT_CACHE_DIR, DEFAULT_DISK_CACHE_SIZE
 
 
 class AudioApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, cache_budget=DEFAULT_CACHE_BUDGET, disk_cache_dir=DEFAULT_CACHE_DIR,
+                 disk_cache_size=DEFAULT_DISK_CACHE_SIZE, working_rate=None):
         super().__init__()
-        # Mono init attempt
-        pygame.mixer.init(frequency=44100, size=-16, channels=1)
+
+        # Every source is converted once to this rate (the output device's by default),
+        # so effects, caches and playback all run at one rate without resampling later
+        self.working_rate = working_rate or device_rate()
 
         self.audio_file = None
-        self.current_effect = "Original"
+        # Whether files keep their channels or are turned into one signal for the effects
+        self.channel_mode = CHANNELS_KEEP
+        # Effects applied to playback, in order; empty plays the original
+        self.chain = EffectChain()
+        # "Original" or "Processed" once a waveform is shown, the processed one follows the chain
+        self.shown_view = None
         self.waveform_data = None
         self.fs = None
 
-        self.recording = False
-        self.record_paused = False
-        self.recorded_frames = []
-        self.record_fs = 44100
-        self.record_channels = 1
-        self.stream = None
-        self.recorded_sound = None
+        # Rendered buffers shared by playback and plotting.
+        # source_id changes whenever waveform_data is replaced.
+        self.processed_cache = ProcessedCache(cache_budget)
+        self.source_id = None
+        self.recording_ids = itertools.count(1)
+        # Decoded MP3s kept on disk between sessions
+        self.decoded_cache = DecodedCache(disk_cache_dir, disk_cache_size)
 
-        self.processed_data = None
-        self.processed_sound = None
+        # Rendering and decoding run on this pool so the GUI thread never blocks.
+        # render_task is the effect render whose result the user is waiting for.
+        self.thread_pool = make_thread_pool()
+        self.render_task = None
+        self.decode_task = None
 
-        # Play situation
-        self.file_play_channel = None
-        self.is_file_paused = False
+        self.recording = False
+        self.record_paused = False
+        self.record_fs = self.working_rate
+        self.record_channels = input_channels()
+        self.recorder = None
+        # Long sessions can be written straight to a WAV file in recordings_dir
+        self.record_to_disk = False
+        self.recordings_dir = DEFAULT_RECORDINGS_DIR
+
+        # Block based output stream used for all playback, and the frame the next
+        # Play starts from (moved by the position slider while stopped)
+        self.player = None
+        self.start_frame = 0
+        # Processors of the running stream by (stage, effect key, channels)
+        self.stage_processors = {}
+
+        # Callback timing of the output and input streams against their deadlines,
+        # kept over the whole session and exported with the stage timings
+        self.playback_stats = CallbackStats("Playback", profiler)
+        self.record_stats = CallbackStats("Recording", profiler)
 
         # Which resource has been used lastly? "file", "recording", or None
         self.last_source = None
 
         self.initUI()
 
+        # Parameter changes are re-plotted once the slider has been still for a moment
+        self.replot_timer = QTimer(self)
+        self.replot_timer.setSingleShot(True)
+        self.replot_timer.setInterval(200)
+        self.replot_timer.timeout.connect(lambda: self.plot_graph("Processed"))
+
+        # Each stream pushes its blocks into its own tap, the timer analyses them for the
+        # live views. While recording the views show the input, otherwise the output.
+        self.playback_tap = None
+        self.record_tap = None
+        self.live_tap = None
+        self.live_timer = QTimer(self)
+        self.live_timer.setInterval(33)  # ~30 fps
+        self.live_timer.timeout.connect(self.update_live_view)
+
+        # Moves the playhead of the waveform view while the output stream runs
+        self.playhead_timer = QTimer(self)
+        self.playhead_timer.setInterval(16)  # ~60 fps
+        self.playhead_timer.timeout.connect(self.update_playhead)
+
+        # Callback load and overrun counts in the status bar, once a second
+        self.timing_timer = QTimer(self)
+        self.timing_timer.setInterval(1000)
+        self.timing_timer.timeout.connect(self.update_timing_label)
+        self.timing_timer.start()
+
     def initUI(self):
         self.setWindowTitle("Audio Effects Application")
         self.setGeometry(100, 100, 900, 600)
@@ -145,11 +208,47 @@ class AudioApp(QMainWindow):
         load_action.triggered.connect(self.load_audio_file)
         file_menu.addAction(load_action)
 
+        record_to_disk_action = QAction("Record Straight to Disk", self, checkable=True)
+        record_to_disk_action.setChecked(self.record_to_disk)
+        record_to_disk_action.toggled.connect(self.set_record_to_disk)
+        file_menu.addAction(record_to_disk_action)
+
+        clear_cache_action = QAction("Clear Decode Cache", self)
+        clear_cache_action.triggered.connect(self.clear_decoded_cache)
+        file_menu.addAction(clear_cache_action)
+
+        file_menu.addSeparator()
+        export_profile_action = QAction("Export Profile...", self)
+        export_profile_action.triggered.connect(lambda: self.export_profile(trace=False))
+        file_menu.addAction(export_profile_action)
+        export_trace_action = QAction("Export Chrome Trace...", self)
+        export_trace_action.triggered.connect(lambda: self.export_profile(trace=True))
+        file_menu.addAction(export_trace_action)
+        reset_profile_action = QAction("Reset Profile", self)
+        reset_profile_action.triggered.connect(self.reset_profile)
+        file_menu.addAction(reset_profile_action)
+        file_menu.addSeparator()
+
+        channels_menu = file_menu.addMenu("Stereo Files")
+        channels_group = QActionGroup(self)
+        for text, mode in (("Keep All Channels", CHANNELS_KEEP), ("Mix Channels to Mono", CHANNELS_MIX),
+                           ("First Channel Only", CHANNELS_FIRST)):
+            action = QAction(text, self, checkable=True)
+            action.setChecked(mode == self.channel_mode)
+            action.triggered.connect(lambda checked, mode=mode: self.set_channel_mode(mode))
+            channels_group.addAction(action)
+            channels_menu.addAction(action)
+
+        # Every registered effect can be switched on and off, they are applied in the order they were added
         effects_menu = menu_bar.addMenu("Effects")
         effects_menu.addAction("Original", self.reset_effects)
-        effects_menu.addAction("Echo", self.apply_echo)
-        effects_menu.addAction("Bass", self.apply_bass)
-        effects_menu.addAction("Reverb", self.apply_reverb)
+        effects_menu.addSeparator()
+        self.effect_actions = {}
+        for name in EFFECTS:
+            action = QAction(name, self, checkable=True)
+            action.triggered.connect(lambda checked, name=name: self.toggle_effect(name))
+            effects_menu.addAction(action)
+            self.effect_actions[name] = action
 
         help_menu = menu_bar.addMenu("Help")
         about_action = QAction("About", self)
@@ -159,6 +258,14 @@ class AudioApp(QMainWindow):
         # Status bar
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.hide()
+        self.status_bar.addPermanentWidget(self.progress_bar)
+        # Hovering shows the time of the last load, render and draw stages
+        self.timing_label = QLabel()
+        self.status_bar.addPermanentWidget(self.timing_label)
 
         main_widget = QWidget()
         self.setCentralWidget(main_widget)
@@ -177,9 +284,17 @@ class AudioApp(QMainWindow):
         stop_file_button = QPushButton("Stop")
         stop_file_button.clicked.connect(self.stop)
 
+        # Position in milliseconds, dragging it seeks
+        self.position_slider = QSlider(Qt.Horizontal)
+        self.position_slider.setRange(0, 0)
+        self.position_slider.valueChanged.connect(self.seek)
+        self.position_label = QLabel("0:00 / 0:00")
+
         file_control_layout.addWidget(play_file_button)
         file_control_layout.addWidget(pause_file_button)
         file_control_layout.addWidget(stop_file_button)
+        file_control_layout.addWidget(self.position_slider, 1)
+        file_control_layout.addWidget(self.position_label)
         file_control_group.setLayout(file_control_layout)
         main_layout.addWidget(file_control_group)
 
@@ -197,22 +312,23 @@ class AudioApp(QMainWindow):
         default_effect_btn.setFont(QFont('', weight=QFont.Bold))
         default_effect_btn.clicked.connect(self.reset_effects)
 
-        echo_btn = QPushButton("Echo")
-        echo_btn.clicked.connect(self.apply_echo)
-
-        bass_btn = QPushButton("Bass")
-        bass_btn.clicked.connect(self.apply_bass)
-
-        reverb_btn = QPushButton("Reverb")
-        reverb_btn.clicked.connect(self.apply_reverb)
-
         effects_layout.addWidget(default_effect_btn)
-        effects_layout.addWidget(echo_btn)
-        effects_layout.addWidget(bass_btn)
-        effects_layout.addWidget(reverb_btn)
+
+        self.effect_buttons = {}
+        for name in EFFECTS:
+            button = QPushButton(name, checkable=True)
+            button.clicked.connect(lambda checked, name=name: self.toggle_effect(name))
+            effects_layout.addWidget(button)
+            self.effect_buttons[name] = button
 
         effects_group.setLayout(effects_layout)
 
+        # Sliders for every effect in the chain, rebuilt when effects are added or removed
+        self.params_group = QGroupBox("Effect Parameters")
+        self.params_layout = QVBoxLayout()
+        self.params_group.setLayout(self.params_layout)
+        self.params_group.hide()
+
         # Volume Control
         volume_group = QGroupBox("Volume Control")
         volume_layout = QVBoxLayout()
@@ -262,6 +378,7 @@ class AudioApp(QMainWindow):
         file_group.setLayout(file_layout)
 
         left_panel.addWidget(effects_group)
+        left_panel.addWidget(self.params_group)
         left_panel.addWidget(volume_group)
         left_panel.addWidget(self.effect_label)
         left_panel.addWidget(record_group)
@@ -274,30 +391,33 @@ class AudioApp(QMainWindow):
         # Right panel - Waveform Visualization
         right_card = QGroupBox("Waveform Visualization")
         right_layout = QVBoxLayout()
-        
-        self.figure = Figure(facecolor='#303030')
-        self.canvas = FigureCanvas(self.figure)
-        right_layout.addWidget(self.canvas)
-
-        # Matplotlib dark style for plot
-        self.figure.patch.set_facecolor('#303030')
-        ax = self.figure.add_subplot(111)
-        ax.set_facecolor('#303030')
-        ax.tick_params(colors='white', which='both') 
-        ax.spines['bottom'].set_color('white')
-        ax.spines['top'].set_color('white') 
-        ax.spines['right'].set_color('white')
-        ax.spines['left'].set_color('white')
-        ax.xaxis.label.set_color('white')
-        ax.yaxis.label.set_color('white')
-        ax.title.set_color('white')
+        self.view_tabs = QTabWidget()
+
+        # Wheel to zoom, drag to pan, double click for the whole waveform.
+        # matplotlib is only imported when the first waveform is shown.
+        self.waveform_view = WaveformView()
+        self.view_tabs.addTab(self.waveform_view, "Waveform")
+
+        # Spectrogram of the same buffer, rendered and cached together with the waveform,
+        # and a scrolling one of the live signal below it
+        spectrogram_tab = QWidget()
+        spectrogram_layout = QVBoxLayout(spectrogram_tab)
+        spectrogram_layout.setContentsMargins(0, 0, 0, 0)
+        self.spectrogram_view = SpectrogramView()
+        spectrogram_layout.addWidget(self.spectrogram_view)
+        self.live_spectrogram = LiveSpectrogram()
+        spectrogram_layout.addWidget(self.live_spectrogram)
+        self.view_tabs.addTab(spectrogram_tab, "Spectrogram")
+        right_layout.addWidget(self.view_tabs)
+
+        # Live input/output level while recording or playing
+        self.live_view = LiveView()
+        right_layout.addWidget(self.live_view)
 
         # Graph buttons
         graph_buttons = {
             "Original": lambda: self.plot_graph("Original"),
-            "Echo": lambda: self.plot_graph("Echo"),
-            "Bass": lambda: self.plot_graph("Bass"),
-            "Reverb": lambda: self.plot_graph("Reverb")
+            "Processed": lambda: self.plot_graph("Processed"),
         }
 
         graph_layout = QHBoxLayout()
@@ -319,193 +439,177 @@ class AudioApp(QMainWindow):
             self.audio_file = file_path
             self.file_label.setText(f"Loaded File: {file_path}")
             self.status_bar.showMessage("Audio file loaded.")
-            pygame.mixer.music.load(file_path)
+            if self.read_audio_file(file_path):
+                self.last_source = "file"
+        else:
+            self.unload_audio_file()
+
+    def unload_audio_file(self):
+        self.stop_playback()
+        self.audio_file = None
+        self.waveform_data = None
+        self.fs = None
+        self.processed_cache.clear()
+        self.source_id = None
 
+    def read_audio_file(self, file_path):
+        self.cancel_tasks()
+        self.stop_playback()
+        self.processed_cache.clear()
+        try:
+            self.source_id = (file_path, os.path.getmtime(file_path), self.channel_mode)
             if file_path.lower().endswith(".wav"):
-                self.read_wav_file(file_path)
+                with profiler.stage("load", file=os.path.basename(file_path)):
+                    self.read_wav_file(file_path)
             elif file_path.lower().endswith(".mp3"):
-                self.read_mp3_file(file_path)  # New function for MP3 file
+                with profiler.stage("load", file=os.path.basename(file_path)):
+                    self.read_mp3_file(file_path)  # New function for MP3 file
             else:
                 self.waveform_data = None
                 self.fs = None
                 self.status_bar.showMessage("Unsupported file format.")
-
-            self.last_source = "file"
+        except (ValueError, OSError) as e:
+            # Unsupported WAV formats and damaged files
+            self.unload_audio_file()
+            self.file_label.setText("Loaded File: - ")
+            self.status_bar.showMessage("Could not load the audio file.")
+            QMessageBox.critical(self, "Error", f"Could not load {file_path}: {e}")
+            return False
+        self.show_position(0)
+        return True
+
+    def set_record_to_disk(self, enabled):
+        self.record_to_disk = enabled
+        if enabled:
+            self.status_bar.showMessage(f"New recordings are written to {self.recordings_dir}.")
         else:
-            self.audio_file = None
-            self.waveform_data = None
-            self.fs = None
+            self.status_bar.showMessage("New recordings are kept in memory.")
 
-    def read_wav_file(self, file_path):
-        with wave.open(file_path, 'rb') as wf:
-            n_channels = wf.getnchannels()
-            sampwidth = wf.getsampwidth()
-            framerate = wf.getframerate()
-            n_frames = wf.getnframes()
-            data = wf.readframes(n_frames)
-
-        if sampwidth == 2:
-            dtype = np.int16
-        elif sampwidth == 4:
-            dtype = np.int32
-        else:
-            dtype = np.uint8
+    def clear_decoded_cache(self):
+        self.decoded_cache.clear()
+        self.status_bar.showMessage("Decode cache cleared.")
 
-        waveform = np.frombuffer(data, dtype=dtype)
-        if n_channels > 1:
-            waveform = waveform[0::n_channels]
-        self.waveform_data = waveform.astype(np.float32) / 32767.0
-        self.fs = framerate
-        self.status_bar.showMessage("WAV file waveform loaded for effects.")
+    def set_channel_mode(self, mode):
+        self.channel_mode = mode
+        # The loaded file is opened again so the effects see the new mix
+        if self.audio_file is not None and self.last_source == "file":
+            self.read_audio_file(self.audio_file)
+
+    def read_wav_file(self, file_path):
+        # At the working rate the samples stay on disk and blocks are converted to
+        # float32 as they are read; other rates are resampled once in the background
+        wav = WavFile(file_path, self.channel_mode)
+        if wav.framerate == self.working_rate:
+            self.waveform_data = wav
+            self.fs = wav.framerate
+            self.status_bar.showMessage("WAV file waveform loaded for effects.")
+            return
+        settings = ("wav", self.channel_mode, self.working_rate)
+        if not self.load_decoded(file_path, settings):
+            self.decode_in_background(file_path, settings, WavResampler(wav, self.working_rate),
+                                      f"Resampling WAV from {wav.framerate} Hz")
 
     def read_mp3_file(self, file_path):
-        # Let's obtain waweform and fs with librosa for the MP3 file.
-        y, sr = librosa.load(file_path, sr=None, mono=False)
-        #  If it is stereo turn it to mono. (Using mean function)
-        if y.ndim > 1:
-            y = np.mean(y, axis=0)
-        self.waveform_data = y.astype(np.float32)
-        self.fs = sr
-        self.status_bar.showMessage("MP3 file waveform loaded for effects.")
+        settings = ("mp3", self.channel_mode, self.working_rate)
+        if not self.load_decoded(file_path, settings):
+            decoder = Mp3Decoder(file_path, self.channel_mode, fs_out=self.working_rate)
+            self.decode_in_background(file_path, settings, decoder, "Decoding MP3")
+
+    def load_decoded(self, file_path, settings):
+        cached = self.decoded_cache.load(file_path, settings)
+        if cached is None:
+            return False
+        self.waveform_data, self.fs = cached
+        self.status_bar.showMessage("Waveform loaded from the decode cache.")
+        return True
+
+    def decode_in_background(self, file_path, settings, decoder, text):
+        # The buffer fills up on the thread pool, effects and plots can use the
+        # decoded part right away
+        self.waveform_data = decoder.buffer
+        self.fs = decoder.fs
+        decoded_cache = self.decoded_cache
+
+        def decode(progress):
+            buffer = decoder.run(progress)
+            decoded_cache.store(file_path, settings, buffer.view(), decoder.fs)
+            return buffer
+
+        task = Task(decode)
+        task.signals.progress.connect(lambda percent: self.show_progress(text, percent))
+        task.signals.finished.connect(lambda result: self.source_decoded(task))
+        task.signals.error.connect(lambda message: self.task_failed(task, "loading the file", message))
+        task.signals.cancelled.connect(lambda: self.task_done(task))
+        self.decode_task = task
+        self.show_progress(text, 0)
+        self.thread_pool.start(task)
+
+    def source_decoded(self, task):
+        self.task_done(task)
+        if task is not self.decode_task:
+            return
+        self.decode_task = None
+        self.show_position(self.start_frame)
+        self.status_bar.showMessage("Waveform loaded for effects.")
 
     def play(self):
-        if self.last_source is None:
+        if self.waveform_data is None:
             QMessageBox.information(self, "Info", " Upload an audio file or make a recording.")
             return
 
-        if self.last_source == "recording":
-            if self.is_file_paused:
-                if self.processed_sound is not None and self.current_effect != "Original":
-                    if self.file_play_channel is not None:
-                        self.file_play_channel.unpause()
-                        self.is_file_paused = False
-                        self.status_bar.showMessage("Resumed recorded sound (processed).")
-                        return
-                else:
-                    if self.recorded_sound is not None:
-                        if self.file_play_channel is not None:
-                            self.file_play_channel.unpause()
-                            self.is_file_paused = False
-                            self.status_bar.showMessage("Resumed recorded sound (original).")
-                            return
-            self.stop()
-            if self.recorded_sound is None and self.waveform_data is None:
-                QMessageBox.information(self, "Info", "No recorded audio available.")
-                return
-
-            if self.current_effect == "Original":
-                if self.recorded_sound is not None:
-                    self.file_play_channel = self.recorded_sound.play()
-                    self.is_file_paused = False
-                    self.status_bar.showMessage("Playing recorded sound (original).")
-                else:
-                    QMessageBox.information(self, "Info", "No recorded audio available.")
-            else:
-                if self.waveform_data is None:
-                    QMessageBox.warning(self, "Warning", "Cannot apply effects to recording without waveform data.")
-                    return
-                self.apply_effect(self.current_effect)
-                if self.processed_sound is not None:
-                    self.file_play_channel = self.processed_sound.play()
-                    self.is_file_paused = False
-                    self.status_bar.showMessage(f"Playing recorded sound with {self.current_effect} effect.")
-                else:
-                    QMessageBox.warning(self, "Warning", "No processed sound for recording.")
-
-        elif self.last_source == "file":
-            if self.is_file_paused:
-                if self.current_effect != "Original" and self.processed_sound is not None and self.file_play_channel is not None:
-                    self.file_play_channel.unpause()
-                    self.is_file_paused = False
-                    self.status_bar.showMessage("Resumed processed file playback.")
-                    return
-                else:
-                    pygame.mixer.music.unpause()
-                    self.is_file_paused = False
-                    self.status_bar.showMessage("Resumed original file playback.")
-                    return
-
-            self.stop()
-            if self.audio_file is None:
-                QMessageBox.information(self, "Info", "No audio file loaded.")
-                return
+        if self.player is not None and self.player.paused:
+            self.player.resume()
+            self.live_timer.start()
+            self.status_bar.showMessage("Resumed playback.")
+            return
 
-            if self.current_effect == "Original":
-                pygame.mixer.music.play()
-                self.is_file_paused = False
-                self.status_bar.showMessage("Playing original file...")
-            else:
-                if self.waveform_data is None:
-                    QMessageBox.warning(self, "Warning", "Cannot apply effects without waveform data.")
-                    return
-                self.apply_effect(self.current_effect)
-                if self.processed_sound is None:
-                    QMessageBox.warning(self, "Warning", "No processed sound available.")
-                    return
-                self.file_play_channel = self.processed_sound.play()
-                self.is_file_paused = False
-                self.status_bar.showMessage(f"Playing {self.current_effect} effect on file...")
+        # stop_playback rewinds, a position chosen while stopped is kept here
+        start = self.start_frame
+        self.stop_playback()
+        self.start_stream_playback(start)
+        source = "recorded sound" if self.last_source == "recording" else "file"
+        message = f"Playing {source} ({chain_label(self.chain)})"
+        if self.player.device_rate != self.fs:
+            message += f", resampled from {self.fs} Hz to the device rate of {self.player.device_rate} Hz"
+        self.status_bar.showMessage(message + "...")
 
     def pause(self):
-        if self.last_source is None:
-            QMessageBox.information(self, "Info", "Upload an audio file or make a recording.")
+        if self.player is None or self.player.paused:
+            self.status_bar.showMessage("Nothing is playing.")
             return
-
-        if self.last_source == "recording":
-            if self.current_effect != "Original" and self.processed_sound is not None and self.file_play_channel is not None:
-                self.file_play_channel.pause()
-                self.is_file_paused = True
-                self.status_bar.showMessage("Paused recorded (processed) playback.")
-            else:
-                if self.file_play_channel is not None:
-                    self.file_play_channel.pause()
-                    self.is_file_paused = True
-                    self.status_bar.showMessage("Paused recorded (original) playback.")
-                else:
-                    self.status_bar.showMessage("No recorded audio is playing.")
-        else:
-            if self.current_effect != "Original" and self.processed_sound is not None and self.file_play_channel is not None:
-                self.file_play_channel.pause()
-                self.is_file_paused = True
-                self.status_bar.showMessage("Paused processed file playback.")
-            else:
-                pygame.mixer.music.pause()
-                self.is_file_paused = True
-                self.status_bar.showMessage("Paused original file playback.")
+        self.player.pause()
+        self.status_bar.showMessage("Paused playback.")
 
     def stop(self):
-        if self.last_source is None:
-            QMessageBox.information(self, "Info", "Upload an audio file or make a recording.")
+        if self.player is None:
+            self.status_bar.showMessage("Nothing is playing.")
             return
-
-        if self.file_play_channel is not None:
-            self.file_play_channel.stop()
-            self.file_play_channel = None
-
-        pygame.mixer.music.stop()
-        pygame.mixer.music.rewind()
-        self.is_file_paused = False
-
-        if self.last_source == "recording":
-            self.status_bar.showMessage("Stopped recorded audio playback.")
-        else:
-            self.status_bar.showMessage("Stopped file playback.")
-
-    def audio_callback(self, indata, frames, time, status):
-        if self.recording and not self.record_paused:
-            self.recorded_frames.append(indata.copy())
+        self.stop_playback()
+        self.status_bar.showMessage("Stopped playback.")
+
+    def stop_playback(self):
+        # Stopping rewinds, the next Play starts from the beginning
+        if self.player is not None:
+            self.player.stop()
+            self.player = None
+        self.start_frame = 0
+        self.stage_processors = {}
+        self.show_position(0)
 
     def start_recording(self):
         if self.recording:
             self.status_bar.showMessage("Already recording.")
             return
 
-        if self.stream is None:
-            self.stream = sd.InputStream(samplerate=self.record_fs, 
-                                         channels=self.record_channels,
-                                         callback=self.audio_callback)
-        self.recorded_frames = []
-        self.stream.start()
+        file_path = None
+        if self.record_to_disk:
+            os.makedirs(self.recordings_dir, exist_ok=True)
+            file_path = os.path.join(self.recordings_dir, time.strftime("recording-%Y%m%d-%H%M%S.wav"))
+        self.record_tap = BlockTap(self.record_channels)
+        self.recorder = Recorder(self.record_fs, self.record_channels, file_path, monitor=self.record_tap,
+                                 stats=self.record_stats)
+        self.recorder.start()
+        self.live_timer.start()
         self.recording = True
         self.record_paused = False
         self.record_status_label.setText("Recording Status: Recording...")
@@ -514,165 +618,348 @@ class AudioApp(QMainWindow):
     def pause_recording_func(self):
         if self.recording and not self.record_paused:
             self.record_paused = True
+            self.recorder.paused = True
             self.record_status_label.setText("Recording Status: Paused")
             self.status_bar.showMessage("Recording paused.")
 
     def stop_recording_func(self):
-        if self.stream is not None and self.recording:
-            self.stream.stop()
-            self.stream.close()
-            self.stream = None
+        if self.recorder is not None and self.recording:
+            recording = self.recorder.stop()
+            overruns = self.recorder.overruns
+            self.recorder = None
             self.recording = False
             self.record_paused = False
             self.record_status_label.setText("Recording Status: Finished")
             self.status_bar.showMessage("Recording finished and processing.")
 
-            if len(self.recorded_frames) > 0:
-                recorded_data = np.concatenate(self.recorded_frames, axis=0)
-                self.waveform_data = recorded_data.flatten().astype(np.float32)
+            if len(recording) > 0:
+                # The recording buffer or file is used as is, without concatenating or copying
+                self.stop_playback()
+                self.waveform_data = recording
                 self.fs = self.record_fs
-                self.recorded_frames = []
-                int16_data = (self.waveform_data * 32767).astype(np.int16)
-
-                freq, size, chans = pygame.mixer.get_init()
-                if chans == 1:
-                    sound_array = int16_data
+                self.cancel_tasks()
+                self.processed_cache.clear()
+                self.source_id = ("recording", next(self.recording_ids))
+                if isinstance(recording, WavFile):
+                    self.file_label.setText(f"Recorded File: {recording.file_path}")
+                self.show_position(0)
+                if overruns:
+                    self.status_bar.showMessage(f"Recording completed and ready to play ({overruns} overruns, some audio was dropped).")
                 else:
-                    sound_array = np.repeat(int16_data[:, np.newaxis], 2, axis=1)
-
-                self.recorded_sound = pygame.sndarray.make_sound(sound_array)
-                self.status_bar.showMessage("Recording completed and ready to play.")
+                    self.status_bar.showMessage("Recording completed and ready to play.")
                 self.last_source = "recording"
             else:
                 QMessageBox.information(self, "Info", "No recording data.")
                 self.record_status_label.setText("Recording Status: None")
                 self.status_bar.showMessage("No recording data.")
 
-    def apply_effect(self, effect_name):
-        self.current_effect = effect_name
-        self.effect_label.setText("Active Effect: " + effect_name)
-        if self.waveform_data is not None and self.fs is not None:
-            processed_data = self.get_processed_data(effect_name)
-            int16_data = (processed_data * 32767).astype(np.int16)
-            freq, size, chans = pygame.mixer.get_init()
-            if chans == 1:
-                sound_array = int16_data
-            else:
-                sound_array = np.stack((int16_data, int16_data), axis=-1)
-            self.processed_data = processed_data
-            self.processed_sound = pygame.sndarray.make_sound(sound_array)
+    def chain_changed(self, rebuild=False):
+        effects = self.chain.effects
+        self.effect_label.setText("Active Effect: " + chain_label(effects))
+        for name in EFFECTS:
+            enabled = self.chain.index(name) is not None
+            self.effect_actions[name].setChecked(enabled)
+            self.effect_buttons[name].setChecked(enabled)
+        if rebuild:
+            self.build_params_panel()
+        self.cancel_render(keep=chain_key(effects))
+        # Effects are rendered block by block while playing, so a running stream
+        # just switches to the new chain from the next block on.
+        if self.player is not None and self.fs is not None:
+            self.player.set_source(*self.playback_source(effects))
+        if self.shown_view == "Processed" and self.waveform_data is not None:
+            self.replot_timer.start()
+
+    def build_params_panel(self):
+        while self.params_layout.count():
+            widget = self.params_layout.takeAt(0).widget()
+            if widget is not None:
+                widget.deleteLater()
+        for index, effect in enumerate(self.chain):
+            title = QLabel(f"{index + 1}. {effect.name}")
+            title.setFont(QFont('', weight=QFont.Bold))
+            self.params_layout.addWidget(title)
+            for param in effect.params:
+                label = QLabel(f"{param.label}: {effect[param.name]}")
+                slider = QSlider(Qt.Horizontal)
+                slider.setRange(0, param.steps())
+                slider.setValue(param.index(effect[param.name]))
+                slider.valueChanged.connect(
+                    lambda position, index=index, param=param, label=label:
+                    self.set_effect_value(index, param, position, label))
+                self.params_layout.addWidget(label)
+                self.params_layout.addWidget(slider)
+        self.params_group.setVisible(len(self.chain) > 0)
+
+    def set_effect_value(self, index, param, position, label):
+        value = param.value(position)
+        label.setText(f"{param.label}: {value}")
+        self.chain.set_value(index, param.name, value)
+        self.chain_changed()
+
+    def toggle_effect(self, name):
+        self.chain.toggle(name)
+        self.chain_changed(rebuild=True)
+
+    def cached_prefix(self, effects):
+        # The longest leading part of the chain that is already rendered, so only
+        # the stages after it (the changed one and everything behind it) are computed
+        for done in range(len(effects), 0, -1):
+            cached = self.processed_cache.get(self.processed_key(effects[:done]))
+            if cached is not None:
+                return done, cached
+        return 0, self.waveform_data
+
+    def playback_source(self, effects):
+        # The cached prefix plus one processor per remaining stage. Stages whose
+        # position and settings did not change keep the processor of the running
+        # stream, so moving a slider only restarts that stage and the others keep
+        # their tails, delay lines and pitch marks.
+        done, data = self.cached_prefix(effects)
+        channels = channel_count(data)
+        running = self.stage_processors
+        self.stage_processors = {}
+        for index in range(done, len(effects)):
+            key = (index, effects[index].key(), channels)
+            processor = running.get(key)
+            if processor is None:
+                processor = effects[index].processor(self.fs, channels=channels)
+            self.stage_processors[key] = processor
+        return data, ChainProcessor(self.stage_processors.values())
+
+    def start_stream_playback(self, start=0):
+        # The stream reads the source (or a cached render) in place, nothing is copied
+        self.stage_processors = {}
+        data, processor = self.playback_source(self.chain.effects)
+        self.playback_tap = BlockTap(channel_count(data))
+        self.player = StreamPlayer(data, self.fs, processor, monitor=self.playback_tap, start=start,
+                                   stats=self.playback_stats)
+        self.player.volume = self.volume_slider.value() / 100.0
+        self.player.start()
+        self.playhead_timer.start()
+        self.live_timer.start()
+
+    def update_live_view(self):
+        playback_blocks = self.playback_tap.drain() if self.playback_tap is not None else []
+        record_blocks = self.record_tap.drain() if self.record_tap is not None else []
+        tap, blocks = (self.record_tap, record_blocks) if self.recorder is not None else (self.playback_tap, playback_blocks)
+        if tap is not self.live_tap:
+            # The views switch streams, none of the old columns or STFT samples carry over
+            self.live_tap = tap
+            self.live_view.reset()
+            self.live_spectrogram.reset()
+        self.live_view.refresh(blocks)
+        self.live_spectrogram.refresh(blocks)
+        streaming = self.player is not None and self.player.active and not self.player.paused
+        if self.recorder is None and not streaming:
+            self.live_timer.stop()
+            self.live_tap = None
+            self.live_view.reset()
+            self.live_spectrogram.reset()
+
+    def update_playhead(self):
+        if self.player is not None and not self.player.active and not self.player.paused:
+            # The stream stopped itself at the end of the source
+            self.stop_playback()
+            self.status_bar.showMessage("Playback finished.")
+        if self.player is None:
+            self.playhead_timer.stop()
+            self.waveform_view.set_playhead(None)
+            self.spectrogram_view.set_playhead(None)
         else:
-            self.processed_data = None
-            self.processed_sound = None
-
-    def reset_effects(self):
-        pygame.mixer.music.set_volume(1.0)
-        self.apply_effect("Original")
-
-    def apply_echo(self):
-        self.apply_effect("Echo")
+            self.waveform_view.set_playhead(self.player.position)
+            self.spectrogram_view.set_playhead(self.player.position)
+            self.show_position(self.player.position)
+
+    def show_position(self, frame):
+        # Moves the slider without triggering a seek
+        if self.fs is None or self.waveform_data is None:
+            length_ms = position_ms = 0
+        else:
+            length_ms = int(1000 * len(self.waveform_data) / self.fs)
+            position_ms = int(1000 * frame / self.fs)
+        self.position_slider.blockSignals(True)
+        self.position_slider.setRange(0, length_ms)
+        self.position_slider.setValue(position_ms)
+        self.position_slider.blockSignals(False)
+        self.position_label.setText(f"{format_time(position_ms)} / {format_time(length_ms)}")
+
+    def seek(self, position_ms):
+        if self.fs is None:
+            return
+        frame = int(position_ms * self.fs / 1000)
+        if self.player is not None and not self.player.active and not self.player.paused:
+            # The stream ended by itself and the playhead timer has not cleaned up yet
+            self.stop_playback()
+        if self.player is not None:
+            self.player.seek(frame)
+        else:
+            self.start_frame = frame
+        self.show_position(frame)
+
+    def update_timing_label(self):
+        active = [stats for stats in (self.playback_stats, self.record_stats) if stats.calls]
+        self.timing_label.setText(" | ".join(stats.describe() for stats in active))
+        stages = profiler.summary()
+        self.timing_label.setToolTip("\n".join(
+            f"{name}: last {1000 * stats['last']:.0f} ms, max {1000 * stats['max']:.0f} ms ({stats['count']}x)"
+            for name, stats in sorted(stages.items())))
+
+    def export_profile(self, trace):
+        if trace:
+            file_path, _ = QFileDialog.getSaveFileName(self, "Export Chrome Trace", "trace.json", "JSON (*.json)")
+        else:
+            file_path, _ = QFileDialog.getSaveFileName(self, "Export Profile", "profile.json", "JSON (*.json)")
+        if not file_path:
+            return
+        try:
+            if trace:
+                write_chrome_trace(file_path, profiler)
+            else:
+                write_profile(file_path, profiler, (self.playback_stats, self.record_stats))
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not write {file_path}: {e}")
+            return
+        self.status_bar.showMessage(f"Profile written to {file_path}.")
 
-    def apply_bass(self):
-        self.apply_effect("Bass")
+    def reset_profile(self):
+        profiler.clear()
+        self.playback_stats.reset()
+        self.record_stats.reset()
+        self.update_timing_label()
+        self.status_bar.showMessage("Profile reset.")
 
-    def apply_reverb(self):
-        self.apply_effect("Reverb")
+    def reset_effects(self):
+        self.chain.clear()
+        self.chain_changed(rebuild=True)
 
     def change_volume(self, value):
         volume = value / 100.0
-        pygame.mixer.music.set_volume(volume)
-        if self.processed_sound is not None:
-            self.processed_sound.set_volume(volume)
-        if self.recorded_sound is not None:
-            self.recorded_sound.set_volume(volume)
+        if self.player is not None:
+            self.player.volume = volume
         self.status_bar.showMessage(f"Volume: %{value}")
 
-    def get_processed_data(self, effect_name):
-        data = self.waveform_data.copy()
-        if effect_name == "Original":
-            return data
-        elif effect_name == "Echo":
-            delay_samples = int(0.2 * self.fs)
-            ir = np.zeros(delay_samples+1)
-            ir[0] = 1.0
-            ir[-1] = 0.5
-            processed = convolve(data, ir, mode='full')
-            return processed[:len(data)]
-        elif effect_name == "Bass":
-            cutoff = 1000.0
-            nyq = 0.5 * self.fs
-            normal_cutoff = cutoff / nyq
-            b, a = butter(4, normal_cutoff, btype='low', analog=False)
-            processed = lfilter(b, a, data)
-            return processed
-        elif effect_name == "Reverb":
-            # Reverb parameters
-            ir_length = int(0.5 * self.fs)
-            decay = 0.8
-            dry_wet = 0.6
-            
-            ir = np.zeros(ir_length)
-            ir[0] = 1.0
-            for i in range(1, ir_length):
-                ir[i] = ir[i-1] * decay + np.random.normal(0, 0.01)
-            
-            processed = convolve(data, ir, mode='full')
-            output = dry_wet * processed[:len(data)] + (1 - dry_wet) * data
-            return np.clip(output, -1, 1)
-        else:
-            return data
-
-    def plot_graph(self, effect_name):
+    def processed_key(self, effects):
+        # Every prefix of the chain has its own key, so each stage's output is cached
+        return (self.source_id, chain_key(effects), self.fs)
+
+    def peaks_key(self, effects):
+        return self.processed_key(effects) + ("peaks",)
+
+    def spectrogram_key(self, effects):
+        return self.processed_key(effects) + ("spectrogram",)
+
+    def render_in_background(self, effects, on_finished):
+        # Only one render is waited for at a time, a new request replaces an older one.
+        # Renders of a source that is still decoding are shown but not cached.
+        source_id = None
+        done, data = 0, self.waveform_data
+        if getattr(self.waveform_data, "complete", True):
+            source_id = self.source_id
+            done, data = self.cached_prefix(effects)
+        label = chain_label(effects)
+        self.cancel_render()
+        # No tracemalloc here, it would trace every allocation of the audio callbacks too
+        task = Task(render_with_overviews, effects[done:], data, self.fs)
+        task.chain_key = chain_key(effects)
+        task.signals.progress.connect(lambda percent: self.show_progress(f"Rendering {label}", percent))
+        task.signals.finished.connect(
+            lambda result: self.render_finished(task, source_id, effects, done, result, on_finished))
+        task.signals.error.connect(lambda message: self.task_failed(task, f"rendering {label}", message))
+        task.signals.cancelled.connect(lambda: self.task_done(task))
+        self.render_task = task
+        self.show_progress(f"Rendering {label}", 0)
+        self.thread_pool.start(task)
+
+    def render_finished(self, task, source_id, effects, done, result, on_finished):
+        self.task_done(task)
+        if task is self.render_task:
+            self.render_task = None
+        stages, peaks, spectrogram = result
+        if source_id is not None:
+            # The source may have changed while this was rendering
+            if source_id != self.source_id:
+                return
+            for stage, data in enumerate(stages, done + 1):
+                self.processed_cache.put(self.processed_key(effects[:stage]), data)
+            self.processed_cache.put(self.peaks_key(effects), peaks)
+            self.processed_cache.put(self.spectrogram_key(effects), spectrogram)
+        on_finished(peaks, spectrogram)
+        size = sum(stage.nbytes for stage in stages) + peaks.nbytes + spectrogram.nbytes
+        self.status_bar.showMessage(f"Rendered {chain_label(effects)} ({format_bytes(size)} of audio and overviews).")
+
+    def cancel_render(self, keep=None):
+        if self.render_task is not None and self.render_task.chain_key != keep:
+            self.render_task.cancel()
+            self.render_task = None
+            self.progress_bar.hide()
+
+    def cancel_tasks(self):
+        self.cancel_render()
+        if self.decode_task is not None:
+            self.decode_task.cancel()
+            self.decode_task = None
+            self.progress_bar.hide()
+
+    def show_progress(self, text, percent):
+        self.progress_bar.setValue(percent)
+        self.progress_bar.show()
+        self.status_bar.showMessage(f"{text}... {percent}%")
+
+    def task_done(self, task):
+        if task is self.render_task or task is self.decode_task:
+            self.progress_bar.hide()
+
+    def task_failed(self, task, action, message):
+        self.task_done(task)
+        if task is self.render_task:
+            self.render_task = None
+        if task is self.decode_task:
+            self.decode_task = None
+        QMessageBox.critical(self, "Error", f"An error occurred while {action}: {message.strip().splitlines()[-1]}")
+
+    def plot_graph(self, view):
         if self.waveform_data is None or self.fs is None:
             QMessageBox.warning(self, "Warning", "Please load an audio file or make a recording first!")
             return
 
+        self.shown_view = view
+        effects = self.chain.effects if view == "Processed" else ()
+        peaks = self.processed_cache.get(self.peaks_key(effects))
+        spectrogram = self.processed_cache.get(self.spectrogram_key(effects))
+        if peaks is not None and spectrogram is not None:
+            self.draw_graphs(effects, peaks, spectrogram)
+        elif self.render_task is not None and self.render_task.chain_key == chain_key(effects):
+            return
+        else:
+            self.render_in_background(
+                effects, lambda peaks, spectrogram: self.draw_graphs(effects, peaks, spectrogram))
+
+    def draw_graphs(self, effects, peaks, spectrogram):
         try:
-            # Get processed data and validate
-            processed_data = self.get_processed_data(effect_name)
-            if len(processed_data) == 0:
+            if len(peaks) == 0:
                 QMessageBox.warning(self, "Error", "Processed data is empty!")
                 return
 
-            # Handle NaNs or Infs in processed data
-            processed_data = np.nan_to_num(processed_data, nan=0.0, posinf=0.0, neginf=0.0)
-
-            # Set up plotting
-            self.figure.clear()
-            ax = self.figure.add_subplot(111)
-            ax.set_facecolor('#303030')
-            ax.tick_params(colors='white', which='both')
-            ax.spines['bottom'].set_color('white')
-            ax.spines['top'].set_color('white')
-            ax.spines['right'].set_color('white')
-            ax.spines['left'].set_color('white')
-            ax.xaxis.label.set_color('white')
-            ax.yaxis.label.set_color('white')
-            ax.title.set_color('white')
-
-            # Generate time vector and downsample data
-            t = np.linspace(0, len(processed_data) / self.fs, len(processed_data))
-            sampled_factor = max(1, len(processed_data) // 1000)  # Keep at least 1000 points
-            t_sampled = t[::sampled_factor]
-            processed_downsampled = processed_data[::sampled_factor]
-
-            # Plot waveform
-            ax.plot(t_sampled, processed_downsampled, color='lime')
-            ax.set_title(effect_name + " Waveform")
-            ax.set_xlabel("Time (s)")
-            ax.set_ylabel("Amplitude")
-            ax.set_xlim(0, t_sampled[-1])
-            ax.set_ylim(processed_data.min() - 0.1, processed_data.max() + 0.1)
-
-            self.canvas.draw()
-            self.status_bar.showMessage(f"Showing {effect_name} waveform...")
+            label = chain_label(effects)
+            self.waveform_view.set_peaks(peaks, self.fs, label + " Waveform")
+            self.spectrogram_view.set_spectrogram(spectrogram, label + " Spectrogram")
+            self.status_bar.showMessage(f"Showing {label} waveform...")
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred while plotting the graph: {str(e)}")
 
 
+def format_time(milliseconds):
+    seconds = milliseconds // 1000
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     ex = AudioApp()
     ex.show()
+    # Import the heavy modules in the background once the window is up
+    if "--no-warmup" not in sys.argv:
+        QTimer.singleShot(0, warm_up)
     sys.exit(app.exec_())
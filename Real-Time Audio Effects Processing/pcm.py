@@ -0,0 +1,112 @@
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# How files with more than one channel are handed to the effects. Every mode gives a
+# (frames, channels) array, the first two with a single channel.
+CHANNELS_KEEP = "keep"    # all channels
+CHANNELS_MIX = "mix"      # average of all channels
+CHANNELS_FIRST = "first"  # first (left) channel only
+
+
+def storage_dtype(sampwidth, is_float=False):
+    # dtype of one sample as stored in the file. 24-bit samples have no NumPy
+    # type, they are kept as 3 raw bytes and assembled in decode_pcm.
+    if is_float:
+        if sampwidth == 4:
+            return np.dtype('<f4')
+        if sampwidth == 8:
+            return np.dtype('<f8')
+    elif sampwidth == 1:
+        return np.dtype(np.uint8)
+    elif sampwidth == 2:
+        return np.dtype('<i2')
+    elif sampwidth == 3:
+        return np.dtype(np.uint8)
+    elif sampwidth == 4:
+        return np.dtype('<i4')
+    raise ValueError(f"Unsupported sample format: {sampwidth * 8}-bit {'float' if is_float else 'PCM'}.")
+
+
+def frame_shape(n_frames, n_channels, sampwidth):
+    if sampwidth == 3:
+        return (n_frames, n_channels, 3)
+    return (n_frames, n_channels)
+
+
+def output_channels(n_channels, channels=CHANNELS_KEEP):
+    # Channels of the decoded array for a file with n_channels
+    return n_channels if channels == CHANNELS_KEEP else 1
+
+
+def channel_count(data):
+    # Channels of a (frames, channels) buffer, 1 for a plain 1-D one
+    shape = data.shape
+    return shape[1] if len(shape) > 1 else 1
+
+
+def mix_down(frames):
+    # Mono float32 average of a (frames, channels) block, for the analyses that
+    # look at a single signal. Summing channel columns is much faster than
+    # mean(axis=1) over a short axis.
+    if frames.ndim == 1:
+        return np.asarray(frames, dtype=np.float32)
+    mixed = frames[:, 0].astype(np.float32)
+    for channel in range(1, frames.shape[1]):
+        mixed += frames[:, channel]
+    if frames.shape[1] > 1:
+        mixed *= 1.0 / frames.shape[1]
+    return mixed
+
+
+def decode_pcm(raw, sampwidth, is_float=False, channels=CHANNELS_KEEP):
+    # raw is (frames, channels) in the storage dtype, or (frames, channels, 3) bytes
+    # for 24-bit. Integer formats are scaled so full scale maps to [-1, 1).
+    if channels == CHANNELS_FIRST:
+        raw = raw[:, :1]
+
+    if is_float:
+        out = raw.astype(np.float32)
+    elif sampwidth == 1:
+        # 8-bit WAV is unsigned with silence at 128
+        out = raw.astype(np.float32)
+        out -= 128.0
+        out *= 1.0 / 128
+    elif sampwidth == 2:
+        out = raw.astype(np.float32)
+        out *= 1.0 / 32768
+    elif sampwidth == 3:
+        # Put the 3 bytes in the top of a little endian int32, the sign comes for free
+        packed = np.zeros(raw.shape[:-1] + (4,), dtype=np.uint8)
+        packed[..., 1:] = raw
+        out = packed.view('<i4')[..., 0].astype(np.float32)
+        out *= 1.0 / 2147483648
+    elif sampwidth == 4:
+        out = raw.astype(np.float32)
+        out *= 1.0 / 2147483648
+    else:
+        raise ValueError(f"Unsupported sample width: {sampwidth * 8} bits.")
+
+    if channels != CHANNELS_MIX or out.shape[1] == 1:
+        return out
+    return mix_down(out)[:, np.newaxis]
+
+
+def encode_int16(data, n_channels=None, block_size=65536):
+    # Scale, clip and convert one block at a time through a small float32 scratch
+    # buffer, so the int16 output is the only full-length array. A mono signal is
+    # written to every one of n_channels output channels directly instead of being
+    # stacked afterwards; by default the output has the channels of the input.
+    if n_channels is None:
+        n_channels = channel_count(data)
+    out = np.empty((len(data), n_channels), dtype=np.int16)
+    scratch = np.empty((block_size, channel_count(data)), dtype=np.float32)
+    for start in range(0, len(data), block_size):
+        block = data[start:start + block_size]
+        scaled = scratch[:len(block)]
+        np.multiply(block.reshape(len(block), -1), 32767, out=scaled)
+        np.clip(scaled, -32767, 32767, out=scaled)
+        out[start:start + len(block)] = scaled
+    return out
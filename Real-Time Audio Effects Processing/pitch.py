@@ -0,0 +1,371 @@
+import threading
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from pcm import channel_count, mix_down
+from spectrogram import stft_window
+
+# Pitch range searched by the tracker, in Hz
+PITCH_MIN = 60.0
+PITCH_MAX = 500.0
+# Analysis frames: one every PITCH_HOP seconds, PITCH_FRAME seconds long (two periods of PITCH_MIN)
+PITCH_HOP = 0.01
+PITCH_FRAME = 0.04
+# Normalized autocorrelation a frame needs to count as voiced, and the RMS below which it is silence
+VOICING_THRESHOLD = 0.5
+SILENCE_RMS = 1e-3
+# The shortest lag within this fraction of the best peak wins, which avoids octave errors
+OCTAVE_TOLERANCE = 0.85
+# Spacing of the marks in unvoiced parts, which are copied without shifting
+UNVOICED_STEP = 0.005
+# Frames per autocorrelation batch, grains per overlap-add batch, samples per analysis block
+PITCH_BATCH = 512
+GRAIN_BATCH = 1024
+ANALYSIS_BLOCK_SIZE = 65536
+# Summed windows below this are not divided out, so the gaps between grains when the
+# pitch goes down are not amplified
+WEIGHT_FLOOR = 0.5
+# Sources whose analysis is kept
+ANALYSIS_CACHE_SIZE = 4
+
+
+def read_padded(source, offset, lo, hi):
+    # source[lo - offset:hi - offset] as float32, zeros outside the source
+    out = np.zeros((hi - lo,) + source.shape[1:], dtype=np.float32)
+    start = max(lo, offset)
+    stop = min(hi, offset + len(source))
+    if stop > start:
+        out[start - lo:stop - lo] = source[start - offset:stop - offset]
+    return out
+
+
+@lru_cache(maxsize=1024)
+def grain_window(length):
+    # Periodic Hann window of one grain, summing to 1 at a hop of length / 2
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * (np.arange(length) + 0.5) / length)).astype(np.float32)
+    window.setflags(write=False)
+    return window
+
+
+def detect_f0(frames, fs):
+    # f0 of every row of frames (0 when unvoiced) from the normalized autocorrelation,
+    # divided by the window's own autocorrelation so long lags are not penalised
+    from scipy.fft import next_fast_len, rfft, irfft
+
+    size = frames.shape[1]
+    window = stft_window(size)
+    n_fft = next_fast_len(2 * size, real=True)
+    x = (frames - frames.mean(axis=1, keepdims=True)) * window
+    r = irfft(np.square(np.abs(rfft(x, n_fft, axis=1))), n_fft, axis=1)[:, :size]
+    window_r = irfft(np.square(np.abs(rfft(window, n_fft))), n_fft)[:size]
+
+    energy = r[:, 0]
+    low = int(fs / PITCH_MAX)
+    high = min(int(fs / PITCH_MIN), size // 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lags = r[:, low:high + 1] / (energy[:, np.newaxis] * (window_r[low:high + 1] / window_r[0]))
+    lags = np.nan_to_num(lags)
+
+    best = lags.max(axis=1)
+    inner = lags[:, 1:-1]
+    peaks = (inner > lags[:, :-2]) & (inner >= lags[:, 2:]) & (inner >= OCTAVE_TOLERANCE * best[:, np.newaxis])
+    index = np.where(peaks.any(axis=1), peaks.argmax(axis=1) + 1, lags.argmax(axis=1))
+    index = np.clip(index, 1, lags.shape[1] - 2)
+    rows = np.arange(len(lags))
+    a, b, c = lags[rows, index - 1], lags[rows, index], lags[rows, index + 1]
+    # Parabola through the peak and its neighbours for a fractional lag
+    curve = a - 2 * b + c
+    delta = np.where(curve < 0, np.clip(0.5 * (a - c) / np.where(curve < 0, curve, -1), -0.5, 0.5), 0.0)
+
+    rms = np.sqrt(np.maximum(energy, 0) / np.sum(np.square(window)))
+    voiced = (b >= VOICING_THRESHOLD) & (rms >= SILENCE_RMS)
+    return np.where(voiced, fs / (low + index + delta), 0.0).astype(np.float32)
+
+
+class PitchTracker:
+    # Incremental pitch analysis: blocks go in, f0 is estimated for every frame whose
+    # window has arrived and pitch marks are placed one period apart, each on the
+    # highest sample near where the period predicts it. Unvoiced parts get marks every
+    # UNVOICED_STEP. Used block by block for playback and over a whole source for
+    # pitch_analysis(), so both place the same marks. Blocks are (frames, channels);
+    # the marks come from the mix of all channels and are shared by them, which
+    # keeps the channels in phase.
+    def __init__(self, fs, channels=1):
+        self.fs = fs
+        self.channels = channels
+        self.hop = int(PITCH_HOP * fs)
+        self.size = int(PITCH_FRAME * fs)
+        self.half = self.size // 2
+        self.max_period = int(np.ceil(fs / PITCH_MIN))
+        self.unvoiced_step = int(UNVOICED_STEP * fs)
+        self.reset()
+
+    def reset(self):
+        self.buffer = np.zeros((0, self.channels), dtype=np.float32)
+        self.buffer_start = 0
+        self.received = 0
+        # f0 of frames f0_start onwards, frame i is centred on sample i * hop
+        self.f0 = []
+        self.f0_start = 0
+        # Where the next mark is expected
+        self.position = 0
+        self.new_marks = ([], [], [])
+
+    def read(self, lo, hi):
+        return read_padded(self.buffer, self.buffer_start, lo, hi)
+
+    def push(self, block):
+        self.buffer = np.concatenate((self.buffer, np.asarray(block, dtype=np.float32)))
+        self.received += len(block)
+        first = self.f0_start + len(self.f0)
+        last = (self.received + self.half - self.size) // self.hop
+        for batch in range(first, last + 1, PITCH_BATCH):
+            count = min(PITCH_BATCH, last + 1 - batch)
+            lo = batch * self.hop - self.half
+            mono = mix_down(self.read(lo, lo + (count - 1) * self.hop + self.size))
+            frames = sliding_window_view(mono, self.size)
+            self.f0.extend(detect_f0(frames[::self.hop], self.fs).tolist())
+        self.place_marks()
+
+    def place_marks(self):
+        marks, periods, voiced = self.new_marks
+        while True:
+            frame = (self.position + self.hop // 2) // self.hop - self.f0_start
+            if frame >= len(self.f0):
+                return
+            f0 = self.f0[frame]
+            if f0 > 0:
+                period = int(round(self.fs / f0))
+                reach = period // 4
+                if self.position + reach + period > self.received:
+                    return
+                around = mix_down(self.read(self.position - reach, self.position + reach + 1))
+                mark = self.position - reach + int(np.argmax(around))
+                if marks and mark <= marks[-1]:
+                    mark = marks[-1] + 1
+                marks.append(mark)
+                periods.append(period)
+                voiced.append(True)
+                self.position = mark + period
+            else:
+                if self.position + self.unvoiced_step > self.received:
+                    return
+                marks.append(self.position)
+                periods.append(self.unvoiced_step)
+                voiced.append(False)
+                self.position += self.unvoiced_step
+
+    def take_marks(self):
+        # The marks placed since the last call, as arrays
+        marks, periods, voiced = self.new_marks
+        self.new_marks = ([], [], [])
+        return np.array(marks, dtype=np.int64), np.array(periods, dtype=np.int64), np.array(voiced, dtype=bool)
+
+    def trim(self, keep_from):
+        # Forgets input before keep_from, as far as the tracker itself no longer needs it
+        needed = min(keep_from, (self.f0_start + len(self.f0)) * self.hop - self.half,
+                     self.position - self.max_period)
+        drop = max(0, needed - self.buffer_start)
+        if drop:
+            self.buffer = self.buffer[drop:]
+            self.buffer_start += drop
+        old_frames = max(0, (self.position - self.hop) // self.hop - self.f0_start)
+        if old_frames:
+            del self.f0[:old_frames]
+            self.f0_start += old_frames
+
+
+class PitchAnalysis:
+    # Pitch marks of a whole source with the period around each one
+    def __init__(self, fs, marks, periods, voiced):
+        self.fs = fs
+        self.marks = marks
+        self.periods = periods
+        self.voiced = voiced
+
+    def __len__(self):
+        return len(self.marks)
+
+    @property
+    def nbytes(self):
+        return self.marks.nbytes + self.periods.nbytes + self.voiced.nbytes
+
+    @property
+    def f0(self):
+        # Hz at every mark, 0 where unvoiced
+        return np.where(self.voiced, self.fs / self.periods, 0.0)
+
+
+def analyse_pitch(data, fs, progress=None, block_size=ANALYSIS_BLOCK_SIZE):
+    tracker = PitchTracker(fs, channel_count(data))
+    parts = []
+    for start in range(0, len(data), block_size):
+        tracker.push(data[start:start + block_size])
+        parts.append(tracker.take_marks())
+        tracker.trim(tracker.received)
+        if progress is not None:
+            progress(100 * min(len(data), start + block_size) / len(data))
+    # Silence after the end lets the last frames and marks be placed
+    tracker.push(np.zeros((tracker.size + 2 * tracker.max_period, tracker.channels), dtype=np.float32))
+    parts.append(tracker.take_marks())
+    marks, periods, voiced = (np.concatenate(arrays) for arrays in zip(*parts))
+    return PitchAnalysis(fs, marks, periods, voiced)
+
+
+# Analyses by id() of the source, with a weak reference to check it is still the same object
+analysis_cache = OrderedDict()
+analysis_lock = threading.Lock()
+
+
+def pitch_analysis(data, fs, progress=None):
+    # Pitch tracking is the expensive part of PSOLA and does not depend on the shift,
+    # so it runs once per source buffer (the loaded file or a cached effect stage) and
+    # every later shift only redoes the overlap-add. Sources still being decoded are
+    # analysed without keeping the result.
+    complete = getattr(data, "complete", True)
+    key = (id(data), len(data), fs)
+    with analysis_lock:
+        entry = analysis_cache.get(key)
+        if entry is not None and entry[0]() is data:
+            analysis_cache.move_to_end(key)
+            return entry[1]
+    analysis = analyse_pitch(data, fs, progress)
+    if complete:
+        with analysis_lock:
+            analysis_cache[key] = (weakref.ref(data), analysis)
+            while len(analysis_cache) > ANALYSIS_CACHE_SIZE:
+                analysis_cache.popitem(last=False)
+    return analysis
+
+
+class PsolaSynthesizer:
+    # TD-PSOLA resynthesis. Marks arrive in order, possibly a few at a time; between
+    # two analysis marks a period apart the synthesis marks advance by period / ratio
+    # in voiced parts and by the mark spacing in unvoiced ones. Each synthesis mark
+    # copies the Hann windowed two-period grain around the nearest analysis mark.
+    # Overlapping grains are summed with np.bincount in batches and divided by the
+    # summed windows, so raising the pitch does not raise the level and a ratio of 1
+    # gives the input back. take() hands out (frames, channels) in order.
+    def __init__(self, ratio, start=0, channels=1):
+        self.ratio = ratio
+        self.channels = channels
+        self.reset(start)
+
+    def reset(self, start=0):
+        # Synthesis phase at the last mark of the previous call, and that mark
+        self.phase = 0.0
+        self.last = None
+        self.acc_start = start
+        self.acc = np.zeros((0, self.channels), dtype=np.float32)
+        self.weight = np.zeros(0, dtype=np.float32)
+
+    @property
+    def source_needed(self):
+        # First source sample a later grain can still read
+        if self.last is None:
+            return self.acc_start
+        return self.last[0][0] - self.last[1][0]
+
+    def add(self, read, marks, periods, voiced):
+        if self.last is not None:
+            marks = np.concatenate((self.last[0], marks))
+            periods = np.concatenate((self.last[1], periods))
+            voiced = np.concatenate((self.last[2], voiced))
+        if len(marks) == 0:
+            return
+        self.last = (marks[-1:], periods[-1:], voiced[-1:])
+        if len(marks) < 2:
+            return
+        phase = self.phase + np.concatenate(([0.0], np.cumsum(np.where(voiced[:-1], self.ratio, 1.0))))
+        steps = np.arange(np.ceil(phase[0]), np.ceil(phase[-1]))
+        self.phase = phase[-1]
+        # Rounded half up, not to even, so a mark maps to the same grain however the
+        # marks were split between calls
+        targets = np.floor(np.interp(steps, phase, marks) + 0.5).astype(np.int64)
+        nearest = np.floor(np.interp(steps, phase, np.arange(len(marks))) + 0.5).astype(np.int64)
+        if len(targets):
+            self.grow(int(targets.max() + periods[nearest].max()))
+        for first in range(0, len(targets), GRAIN_BATCH):
+            grains = nearest[first:first + GRAIN_BATCH]
+            self.overlap_add(read, targets[first:first + GRAIN_BATCH], marks[grains], periods[grains])
+
+    def overlap_add(self, read, targets, centers, halves):
+        lengths = 2 * halves
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        window = np.concatenate([grain_window(length) for length in lengths.tolist()])
+        source_lo = int((centers - halves).min())
+        source = read(source_lo, int((centers + halves).max()))
+        values = source[np.repeat(centers - halves - source_lo, lengths) + offsets] * window[:, np.newaxis]
+        positions = np.repeat(targets - halves, lengths) + offsets
+        keep = positions >= self.acc_start
+        positions, values, window = positions[keep], values[keep], window[keep]
+        if len(positions) == 0:
+            return
+        lo = int(positions.min())
+        span = int(positions.max()) + 1 - lo
+        start = lo - self.acc_start
+        end = start + span
+        # One bincount for all channels, over the flattened (position, channel) index
+        index = ((positions - lo) * self.channels)[:, np.newaxis] + np.arange(self.channels)
+        self.acc[start:end] += np.bincount(index.ravel(), weights=values.ravel(),
+                                           minlength=span * self.channels).reshape(span, self.channels)
+        self.weight[start:end] += np.bincount(positions - lo, weights=window, minlength=span)
+
+    def grow(self, stop):
+        # Room for output up to `stop`, added once per call rather than per batch
+        missing = stop - self.acc_start - len(self.acc)
+        if missing > 0:
+            self.acc = np.concatenate((self.acc, np.zeros((missing, self.channels), dtype=np.float32)))
+            self.weight = np.concatenate((self.weight, np.zeros(missing, dtype=np.float32)))
+
+    def take(self, n):
+        out = np.zeros((n, self.channels), dtype=np.float32)
+        ready = min(n, len(self.acc))
+        out[:ready] = self.acc[:ready] / np.maximum(self.weight[:ready], WEIGHT_FLOOR)[:, np.newaxis]
+        self.acc = self.acc[ready:]
+        self.weight = self.weight[ready:]
+        self.acc_start += n
+        return out
+
+    def final(self, max_half):
+        # Samples before this cannot get any more grains when no grain is longer than 2 * max_half
+        if self.last is None:
+            return self.acc_start
+        return int(self.last[0][0]) - max_half
+
+
+def psola(data, analysis, ratio, progress=None, marks_per_batch=8192):
+    # Whole-buffer pitch shift by `ratio` with a precomputed analysis
+    n = len(data)
+    out = np.empty((n, channel_count(data)), dtype=np.float32)
+    synthesizer = PsolaSynthesizer(ratio, channels=channel_count(data))
+    max_half = int(analysis.periods.max()) if len(analysis) else 0
+
+    def read(lo, hi):
+        return read_padded(data, 0, lo, hi)
+
+    for first in range(0, len(analysis), marks_per_batch):
+        last = first + marks_per_batch
+        synthesizer.add(read, analysis.marks[first:last], analysis.periods[first:last],
+                        analysis.voiced[first:last])
+        ready = min(n, synthesizer.final(max_half)) - synthesizer.acc_start
+        if ready > 0:
+            start = synthesizer.acc_start
+            out[start:start + ready] = synthesizer.take(ready)
+        if progress is not None:
+            progress(100 * min(len(analysis), last) / len(analysis))
+    start = synthesizer.acc_start
+    if start < n:
+        out[start:] = synthesizer.take(n - start)
+    return out
+
+
+def pitch_shift(data, fs, semitones, progress=None):
+    # Analysis up to 70 %, unless it is cached, then the overlap-add
+    ratio = 2 ** (semitones / 12)
+    analysis = pitch_analysis(data, fs, None if progress is None else lambda percent: progress(0.7 * percent))
+    return psola(data, analysis, ratio, None if progress is None else lambda percent: progress(70 + 0.3 * percent))
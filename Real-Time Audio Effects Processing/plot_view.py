@@ -0,0 +1,83 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout
+
+from profiling import profiler
+
+
+class PlotView(QWidget):
+    # Base of the waveform and spectrogram views: one dark matplotlib Axes with time
+    # on the x axis and a playhead. The playhead is an animated artist blitted over
+    # the background cached on every full draw, so moving it never redraws the plot.
+    # matplotlib is imported when the first plot is shown. Subclasses set fs once they
+    # have something to show and may hide the playhead through playhead_shown().
+    draw_name = "draw"
+    y_label = ""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(400, 300)
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.canvas = None
+        self.fs = None
+        self.playhead_position = None
+        self.background = None
+
+    def ensure_canvas(self):
+        # True when the canvas was created by this call
+        if self.canvas is not None:
+            return False
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+
+        # Matplotlib dark style for plot, applied once
+        self.figure = Figure(facecolor='#303030')
+        self.canvas = FigureCanvas(self.figure)
+        # Qt calls draw() when the deferred redraw happens, that is what gets timed
+        self.canvas.draw = profiler.wrap(self.canvas.draw, self.draw_name)
+        self.layout.addWidget(self.canvas)
+        ax = self.figure.add_subplot(111)
+        ax.set_facecolor('#303030')
+        ax.tick_params(colors='white', which='both')
+        for spine in ax.spines.values():
+            spine.set_color('white')
+        ax.xaxis.label.set_color('white')
+        ax.yaxis.label.set_color('white')
+        ax.title.set_color('white')
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel(self.y_label)
+        self.ax = ax
+        self.playhead = ax.axvline(0, color='white', linewidth=1, animated=True, visible=False)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        return True
+
+    def on_draw(self, event):
+        # draw_event fires inside the canvas' paintEvent, so the playhead is only
+        # drawn into the buffer being painted; blitting here would repaint recursively
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.draw_playhead()
+
+    def set_playhead(self, position):
+        # position in samples, None hides the playhead
+        self.playhead_position = position
+        if self.canvas is not None and self.fs is not None:
+            self.blit_playhead()
+
+    def playhead_shown(self, position):
+        return True
+
+    def draw_playhead(self):
+        position = self.playhead_position
+        if position is not None and self.fs is not None and self.playhead_shown(position):
+            t = position / self.fs
+            self.playhead.set_xdata([t, t])
+            self.playhead.set_visible(True)
+            self.ax.draw_artist(self.playhead)
+        else:
+            self.playhead.set_visible(False)
+
+    def blit_playhead(self):
+        if self.background is None or not self.isVisible():
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_playhead()
+        self.canvas.blit(self.ax.bbox)
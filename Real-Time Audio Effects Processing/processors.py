@@ -0,0 +1,112 @@
+import numpy as np
+
+from convolution import Convolver, make_plan
+from effects import echo_ir
+from pitch import PitchTracker, PsolaSynthesizer
+
+# Frames per output callback. At 44.1 kHz this is ~23 ms, so playback starts after one such period.
+BLOCK_SIZE = 1024
+
+
+class OriginalProcessor:
+    def process(self, block):
+        return block
+
+    def reset(self):
+        pass
+
+
+class ChainProcessor:
+    # Runs each block through several processors, one after another
+    def __init__(self, processors):
+        self.processors = list(processors)
+
+    def process(self, block):
+        for processor in self.processors:
+            block = processor.process(block)
+        return block
+
+    def reset(self):
+        for processor in self.processors:
+            processor.reset()
+
+
+class EchoProcessor:
+    # y[n] = x[n] + gain * x[n - delay]. The IR only has two non-zero taps, so the
+    # convolution engine applies it as two scaled copies instead of a full convolution.
+    # Every channel gets the same echo.
+    def __init__(self, fs, delay=0.2, gain=0.5, block_size=BLOCK_SIZE, channels=1):
+        self.convolver = Convolver(make_plan(echo_ir(fs, delay, gain), block_size), channels)
+
+    def reset(self):
+        self.convolver.reset()
+
+    def process(self, block):
+        return self.convolver.process(block)
+
+
+class BassProcessor:
+    # Butterworth low-pass, filter memory carried between blocks through zi. sosfilt
+    # runs along the frame axis of the whole (frames, channels) block in one call.
+    def __init__(self, fs, cutoff=1000.0, order=4, channels=1):
+        # scipy.signal is only imported once a filter is actually needed
+        from scipy.signal import butter, sosfilt
+        self.sosfilt = sosfilt
+        nyq = 0.5 * fs
+        # The filter runs in the common type of its coefficients and the input, so
+        # float32 coefficients keep float32 blocks in float32. Second-order sections
+        # stay stable in single precision where a high order b, a form does not.
+        self.sos = butter(order, cutoff / nyq, btype='low', analog=False, output='sos').astype(np.float32)
+        self.channels = channels
+        self.reset()
+
+    def reset(self):
+        # (sections, 2, channels): the state of every section for every channel
+        self.zi = np.zeros((len(self.sos), 2, self.channels), dtype=np.float32)
+
+    def process(self, block):
+        out, self.zi = self.sosfilt(self.sos, block, axis=0, zi=self.zi)
+        return out
+
+
+class ReverbProcessor:
+    # The long, dense IR goes through uniformly partitioned overlap-save convolution;
+    # the partition spectra are computed once per IR and block size and shared.
+    # ir is one IR for all channels or a (taps, channels) array of them.
+    def __init__(self, ir, block_size=BLOCK_SIZE, dry_wet=0.6, channels=1):
+        self.dry_wet = dry_wet
+        self.convolver = Convolver(make_plan(ir, block_size), channels)
+
+    def reset(self):
+        self.convolver.reset()
+
+    def process(self, block):
+        wet = self.convolver.process(block)
+        wet *= self.dry_wet
+        wet += (1 - self.dry_wet) * block
+        return np.clip(wet, -1, 1, out=wet)
+
+
+class PitchShiftProcessor:
+    # Block mode of the PSOLA pitch shift for playback: pitch tracking and marks are
+    # computed as the blocks arrive and the output lags the input by `latency`
+    # samples, enough for the analysis frame and the marks around every output sample.
+    # Offline renders use pitch.pitch_shift() with the cached analysis instead.
+    def __init__(self, fs, semitones=4, channels=1):
+        # Imported here so the first audio callback does not have to
+        import scipy.fft  # noqa: F401
+        self.tracker = PitchTracker(fs, channels)
+        self.synthesizer = PsolaSynthesizer(2 ** (semitones / 12), channels=channels)
+        self.latency = self.tracker.half + self.tracker.hop + 4 * self.tracker.max_period
+        self.reset()
+
+    def reset(self):
+        self.tracker.reset()
+        self.synthesizer.reset(start=-self.latency)
+
+    def process(self, block):
+        self.tracker.push(block)
+        self.synthesizer.add(self.tracker.read, *self.tracker.take_marks())
+        out = self.synthesizer.take(len(block))
+        self.tracker.trim(self.synthesizer.source_needed)
+        return out
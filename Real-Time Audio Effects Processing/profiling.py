@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+import tracemalloc
+from collections import deque
+from functools import wraps
+from time import perf_counter
+
+import numpy as np
+
+# Spans kept for the trace, the oldest are dropped first. Audio callbacks have their
+# own buffer (about 7 minutes of callbacks at 48 kHz and 1024 frames), so they never
+# push the stage spans out.
+MAX_SPANS = 100000
+MAX_CALLBACK_SPANS = 20000
+# Upper edges of the callback histogram, as a fraction of the buffer deadline
+DEADLINE_BINS = (0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, float("inf"))
+
+# tracemalloc is process wide: it runs while at least one measurement is active
+tracing_lock = threading.Lock()
+tracing_users = 0
+
+
+class PeakMemory:
+    # Peak of the memory allocated inside the with block (NumPy arrays included,
+    # they are traced too). tracemalloc slows down every allocation in the process,
+    # audio callbacks included, so this is for batch jobs and benchmarks only.
+    # Measurements running at the same time on other threads share the peak, so
+    # they are only exact for one job at a time.
+    def __init__(self):
+        self.peak = 0
+
+    def __enter__(self):
+        global tracing_users
+        with tracing_lock:
+            if tracing_users == 0:
+                tracemalloc.start()
+            tracing_users += 1
+            tracemalloc.reset_peak()
+            self.start = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc_info):
+        global tracing_users
+        with tracing_lock:
+            self.peak = max(0, tracemalloc.get_traced_memory()[1] - self.start)
+            tracing_users -= 1
+            if tracing_users == 0:
+                tracemalloc.stop()
+        return False
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class Profiler:
+    # Timed spans of the slow stages (load, decode, convert, render, draw) from any
+    # thread, audio callbacks included. Callback spans go into their own deque, whose
+    # append is atomic, so the audio threads never take a lock. Stage spans are rare;
+    # they update the per-stage summary as they arrive, so summary() costs the same
+    # however long the session runs. Exported as a summary or as a Chrome trace.
+    def __init__(self, max_spans=MAX_SPANS, max_callback_spans=MAX_CALLBACK_SPANS):
+        self.spans = deque(maxlen=max_spans)
+        self.callback_spans = deque(maxlen=max_callback_spans)
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.thread_names = {}
+        self.origin = perf_counter()
+
+    def add(self, name, category, start, end, args=None):
+        ident = threading.get_ident()
+        if ident not in self.thread_names:
+            self.thread_names[ident] = threading.current_thread().name
+        span = (name, category, ident, start, end, args)
+        if category == "callback":
+            self.callback_spans.append(span)
+            return
+        with self.lock:
+            self.spans.append(span)
+            stats = self.stages.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+            stats["count"] += 1
+            stats["total"] += end - start
+            stats["max"] = max(stats["max"], end - start)
+            stats["last"] = end - start
+
+    def stage(self, name, category="stage", **args):
+        return StageTimer(self, name, category, args or None)
+
+    def wrap(self, fn, name, category="stage"):
+        # fn timed on every call, e.g. a canvas draw that Qt calls later
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            with self.stage(name, category):
+                return fn(*args, **kwargs)
+        return timed
+
+    def clear(self):
+        with self.lock:
+            self.spans.clear()
+            self.stages.clear()
+        self.callback_spans.clear()
+
+    def summary(self):
+        # {stage: {count, total, max, last}} in seconds since the last clear(), callbacks left out
+        with self.lock:
+            return {name: dict(stats) for name, stats in self.stages.items()}
+
+    def chrome_trace(self):
+        # Trace Event Format, opens in chrome://tracing or ui.perfetto.dev
+        pid = os.getpid()
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}}
+                  for ident, name in list(self.thread_names.items())]
+        with self.lock:
+            spans = list(self.spans)
+        for name, category, ident, start, end, args in spans + list(self.callback_spans):
+            event = {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": ident,
+                     "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6}
+            if args:
+                event["args"] = args
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class StageTimer:
+    def __init__(self, profiler, name, category, args):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, self.category, self.start, perf_counter(), self.args)
+        return False
+
+
+class CallbackStats:
+    # Timing of the audio callbacks of one stream against their deadline, the time
+    # one buffer takes to play. A callback that runs longer than that is an overrun
+    # (the device has to wait for data), as are input overflows reported by PortAudio;
+    # output and input underflows are counted as underruns. Only the audio thread
+    # writes, the GUI just reads the numbers.
+    def __init__(self, name, profiler=None):
+        self.name = name
+        self.profiler = profiler
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.late = 0
+        self.overflows = 0
+        self.underflows = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.deadline = 0.0
+        self.histogram = np.zeros(len(DEADLINE_BINS), dtype=np.int64)
+
+    def record(self, start, end, deadline, status):
+        duration = end - start
+        load = duration / deadline if deadline > 0 else 0.0
+        self.calls += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.deadline = deadline
+        self.histogram[np.searchsorted(DEADLINE_BINS, load)] += 1
+        if load > 1.0:
+            self.late += 1
+        if status:
+            self.overflows += bool(status.input_overflow) + bool(status.output_overflow)
+            self.underflows += bool(status.input_underflow) + bool(status.output_underflow)
+        if self.profiler is not None:
+            self.profiler.add(self.name, "callback", start, end, {"load": round(load, 3)})
+
+    @property
+    def overruns(self):
+        return self.late + self.overflows
+
+    @property
+    def underruns(self):
+        return self.underflows
+
+    def describe(self):
+        if self.calls == 0:
+            return f"{self.name}: idle"
+        mean_ms = 1000 * self.total_time / self.calls
+        return (f"{self.name} {mean_ms:.1f}/{1000 * self.deadline:.1f} ms, max {1000 * self.max_time:.1f} ms, "
+                f"{self.overruns} overruns, {self.underruns} underruns")
+
+    def to_dict(self):
+        edges = ["inf" if edge == float("inf") else edge for edge in DEADLINE_BINS]
+        return {"calls": self.calls, "late": self.late, "overflows": self.overflows,
+                "underflows": self.underflows, "overruns": self.overruns, "underruns": self.underruns,
+                "mean_seconds": self.total_time / self.calls if self.calls else 0.0,
+                "max_seconds": self.max_time, "deadline_seconds": self.deadline,
+                "histogram": {"deadline_fraction_edges": edges, "counts": self.histogram.tolist()}}
+
+
+def write_profile(file_path, profiler, callback_stats=()):
+    # Stage summary and callback histograms as JSON
+    report = {
+        "stages": profiler.summary(),
+        "callbacks": {stats.name: stats.to_dict() for stats in callback_stats},
+    }
+    with open(file_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def write_chrome_trace(file_path, profiler):
+    with open(file_path, "w") as f:
+        json.dump(profiler.chrome_trace(), f)
+
+
+# Shared by the app, the render functions and the loaders
+profiler = Profiler()
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from time import perf_counter
+
+import sounddevice as sd
+
+from buffers import GrowableBuffer, RingBuffer
+from audio_io import WavFile, WavWriter
+
+# Seconds of audio the ring can hold before the drain thread has to catch up
+RING_SECONDS = 2.0
+# How often the drain thread empties the ring
+DRAIN_INTERVAL = 0.05
+# Initial size of the recording buffer, it doubles when it is full
+INITIAL_SECONDS = 60.0
+# How often the header of a recording written to disk gets the current sizes
+HEADER_INTERVAL = 1.0
+DEFAULT_RECORDINGS_DIR = os.path.join(os.path.expanduser("~"), "AudioEffectsRecordings")
+# Recordings keep up to this many channels of the input device
+MAX_RECORD_CHANNELS = 2
+
+
+def input_channels(limit=MAX_RECORD_CHANNELS):
+    # Channels the default input device delivers, at most `limit`
+    try:
+        return max(1, min(limit, int(sd.query_devices(kind='input')['max_input_channels'])))
+    except (sd.PortAudioError, ValueError, KeyError):
+        return 1
+
+
+class Recorder:
+    # Microphone capture. The sounddevice callback only copies each block into a
+    # preallocated ring; a drain thread moves the samples into the recording buffer,
+    # which is handed out as a view when recording stops. With file_path set the drain
+    # thread writes to that WAV file instead and nothing is kept in memory. All
+    # `channels` of the device are kept, as (frames, channels).
+    def __init__(self, fs, channels=1, file_path=None, monitor=None, stats=None):
+        self.fs = fs
+        self.channels = channels
+        # Optional live_view.BlockTap that gets every captured block
+        self.monitor = monitor
+        # Optional profiling.CallbackStats, also counts the overflows
+        self.stats = stats
+        self.file_path = file_path
+        self.ring = RingBuffer(int(RING_SECONDS * fs), channels)
+        if file_path is not None:
+            self.writer = WavWriter(file_path, fs, channels)
+            self.buffer = None
+            self.sink = self.writer.write
+        else:
+            self.writer = None
+            self.buffer = GrowableBuffer(int(INITIAL_SECONDS * fs), channels=channels)
+            self.sink = self.buffer.append
+        self.paused = False
+        self.input_overflows = 0
+        self.stop_event = threading.Event()
+        self.drain_thread = threading.Thread(target=self.drain_loop, name="recorder-drain", daemon=True)
+        self.stream = sd.InputStream(samplerate=fs, channels=channels, dtype='float32',
+                                     callback=self.callback)
+
+    def callback(self, indata, frames, time, status):
+        started = perf_counter()
+        if status.input_overflow:
+            self.input_overflows += 1
+        if not self.paused:
+            self.ring.write(indata)
+            if self.monitor is not None:
+                self.monitor.push(indata)
+        if self.stats is not None:
+            self.stats.record(started, perf_counter(), frames / self.fs, status)
+
+    def drain_loop(self):
+        last_header = time.monotonic()
+        while not self.stop_event.wait(DRAIN_INTERVAL):
+            self.ring.drain(self.sink)
+            if self.writer is not None and time.monotonic() - last_header >= HEADER_INTERVAL:
+                self.writer.update_header()
+                last_header = time.monotonic()
+
+    def start(self):
+        self.stream.start()
+        self.drain_thread.start()
+
+    def stop(self):
+        self.stream.stop()
+        self.stream.close()
+        self.stop_event.set()
+        self.drain_thread.join()
+        self.ring.drain(self.sink)
+        # The recorded audio: a view of the buffer, or the finished file memory mapped
+        if self.writer is not None:
+            self.writer.close()
+            return WavFile(self.file_path)
+        self.buffer.finish()
+        return self.buffer.view()
+
+    @property
+    def overruns(self):
+        # Blocks the device dropped plus samples that did not fit in the ring
+        return self.input_overflows + self.ring.overruns
@@ -0,0 +1,61 @@
+import numpy as np
+
+from pcm import channel_count
+from profiling import profiler
+from spectrogram import Spectrogram
+from waveform import PeakPyramid
+
+# Offline renders reuse the streaming processors with large blocks. Each block is a
+# point where progress is reported and a cancelled render stops.
+RENDER_BLOCK_SIZE = 65536
+
+
+def render_effect(effect, data, fs, progress=None, block_size=RENDER_BLOCK_SIZE):
+    # One float32 (frames, channels) output for the whole render, the processors only
+    # allocate per block
+    channels = channel_count(data)
+    with profiler.stage("render " + effect.name, samples=len(data), channels=channels):
+        if effect.whole_buffer:
+            return effect.render(data, fs, progress)
+        processor = effect.processor(fs, block_size, channels)
+        output = np.empty((len(data), channels), dtype=np.float32)
+        for start in range(0, len(data), block_size):
+            stop = min(start + block_size, len(data))
+            output[start:stop] = processor.process(data[start:stop])
+            if progress is not None:
+                progress(100 * stop / len(data))
+    return output
+
+
+def scaled_progress(progress, low, high):
+    # Maps 0-100 of one step onto low-high of the whole job
+    if progress is None:
+        return None
+    return lambda percent: progress(low + (high - low) * percent / 100)
+
+
+def render_stages(effects, data, fs, progress=None):
+    # Runs the effects one after another and returns the output of every stage,
+    # so each one can be cached as the input of the stages after it
+    stages = []
+    for index, effect in enumerate(effects):
+        low = 100 * index / len(effects)
+        high = 100 * (index + 1) / len(effects)
+        data = render_effect(effect, data, fs, progress=scaled_progress(progress, low, high))
+        stages.append(data)
+    return stages
+
+
+def render_with_overviews(effects, data, fs, progress=None):
+    # Everything the waveform and spectrogram views need: the stages still missing
+    # after `data` (the source or an already cached stage), and the peak pyramid and
+    # the spectrogram of the last one
+    split = 80 if effects else 0
+    stages = render_stages(effects, data, fs, progress=scaled_progress(progress, 0, split))
+    output = stages[-1] if stages else data
+    middle = (split + 100) / 2
+    with profiler.stage("peaks", samples=len(output)):
+        peaks = PeakPyramid(output, progress=scaled_progress(progress, split, middle))
+    with profiler.stage("spectrogram", samples=len(output)):
+        spectrogram = Spectrogram(output, fs, progress=scaled_progress(progress, middle, 100))
+    return stages, peaks, spectrogram
@@ -0,0 +1,119 @@
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+
+from pcm import channel_count
+
+# Zero crossings of the windowed sinc on each side, at the lower of the two rates
+RESAMPLE_ZERO_CROSSINGS = 16
+KAISER_BETA = 8.6
+# Cutoff relative to the lower Nyquist frequency, leaves room for the transition band
+RESAMPLE_ROLLOFF = 0.95
+# Ratios with more phases than this (e.g. 44101 -> 48000) truncate the phase to one of
+# MAX_PHASES, a timing error below 1/MAX_PHASES of a sample
+MAX_PHASES = 4096
+RESAMPLE_BLOCK_SIZE = 65536
+# Outputs computed per gather, bounds the (outputs x taps) temporaries
+RESAMPLE_CHUNK = 4096
+
+
+def rate_ratio(fs_in, fs_out):
+    ratio = Fraction(int(fs_out), int(fs_in))
+    return ratio.numerator, ratio.denominator
+
+
+@lru_cache(maxsize=16)
+def filter_bank(up, down, zero_crossings=RESAMPLE_ZERO_CROSSINGS):
+    # Polyphase bank of a Kaiser windowed sinc. Row p holds the taps for an output that
+    # falls p/phases of the way between two input samples; tap j weights the input
+    # sample half - j samples after the one before the output.
+    cutoff = RESAMPLE_ROLLOFF * min(1.0, up / down)
+    half = int(np.ceil(zero_crossings / cutoff))
+    phases = min(up, MAX_PHASES)
+    offsets = np.arange(2 * half)[np.newaxis, :] - half + np.arange(phases)[:, np.newaxis] / phases
+    # Kaiser window evaluated at the fractional offsets themselves
+    window = np.i0(KAISER_BETA * np.sqrt(np.clip(1 - (offsets / half) ** 2, 0, 1))) / np.i0(KAISER_BETA)
+    bank = (cutoff * np.sinc(cutoff * offsets) * window).astype(np.float32)
+    bank.setflags(write=False)
+    return bank, half
+
+
+class Resampler:
+    # Streaming polyphase resampler from fs_in to fs_out. Blocks of (frames, channels)
+    # go in and every output frame whose input window is complete comes out, so the
+    # output lags the input by `half` input frames; flush() returns the rest at the
+    # end. The channels share the gather indices and filter rows; each one is then
+    # gathered from a contiguous row, which keeps einsum on its fast 2-D path.
+    def __init__(self, fs_in, fs_out, channels=1):
+        self.up, self.down = rate_ratio(fs_in, fs_out)
+        self.channels = channels
+        self.bank, self.half = filter_bank(self.up, self.down)
+        self.taps = self.bank.shape[1]
+        self.phases = len(self.bank)
+        self.reset()
+
+    def reset(self):
+        # Input before the first block counts as silence
+        # Kept channel major, (channels, taps - 1)
+        self.history = np.zeros((self.channels, self.taps - 1), dtype=np.float32)
+        self.received = 0
+        self.produced = 0
+        # Position of the next output sample in units of 1/up input samples
+        self.next_position = 0
+
+    def process(self, block):
+        buffer = np.concatenate((self.history, np.asarray(block, dtype=np.float32).T), axis=1)
+        start = self.received - self.history.shape[1]
+        self.received += len(block)
+        # Outputs whose newest input sample (base + half) has arrived
+        last = (self.received - self.half) * self.up - 1
+        count = max(0, (last - self.next_position) // self.down + 1)
+        out = np.empty((count, self.channels), dtype=np.float32)
+        taps = np.arange(self.taps)
+        for first in range(0, count, RESAMPLE_CHUNK):
+            n = min(RESAMPLE_CHUNK, count - first)
+            positions = self.next_position + self.down * np.arange(first, first + n, dtype=np.int64)
+            base = positions // self.up
+            phase = (positions % self.up) * self.phases // self.up
+            windows = (base + self.half - start)[:, np.newaxis] - taps
+            weights = self.bank[phase]
+            for channel, samples in enumerate(buffer):
+                out[first:first + n, channel] = np.einsum('ij,ij->i', samples[windows], weights)
+        self.next_position += count * self.down
+        self.produced += count
+        self.history = buffer[:, buffer.shape[1] - (self.taps - 1):]
+        return out
+
+    def output_length(self, n_in):
+        return -(-n_in * self.up // self.down)
+
+    def flush(self):
+        # The outputs still waiting for input past the end, which is taken as silence
+        missing = self.output_length(self.received) - self.produced
+        if missing <= 0:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        return self.process(np.zeros((self.half + 1, self.channels), dtype=np.float32))[:missing]
+
+
+def resample_blocks(blocks, resampler):
+    # Streams blocks through the resampler, ending with its flushed tail
+    for block in blocks:
+        yield resampler.process(block)
+    yield resampler.flush()
+
+
+def resample(data, fs_in, fs_out, progress=None, block_size=RESAMPLE_BLOCK_SIZE):
+    # Whole-buffer conversion into one preallocated output
+    if fs_in == fs_out:
+        return np.array(data[0:len(data)], dtype=np.float32)
+    resampler = Resampler(fs_in, fs_out, channel_count(data))
+    out = np.empty((resampler.output_length(len(data)), resampler.channels), dtype=np.float32)
+    blocks = (data[start:start + block_size] for start in range(0, len(data), block_size))
+    written = 0
+    for block in resample_blocks(blocks, resampler):
+        out[written:written + len(block)] = block
+        written += len(block)
+        if progress is not None:
+            progress(100 * min(resampler.received, len(data)) / max(1, len(data)))
+    return out
@@ -0,0 +1,107 @@
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from pcm import mix_down
+
+# Samples per FFT frame and between the starts of two frames
+STFT_SIZE = 1024
+STFT_HOP = 256
+# Frames transformed by one rfft call, bounds the (frames x STFT_SIZE) temporaries
+STFT_BATCH = 256
+# Longer buffers average the power of neighbouring frames into at most this many columns
+MAX_STFT_COLUMNS = 4096
+SPECTROGRAM_FLOOR_DB = -100.0
+
+
+@lru_cache(maxsize=4)
+def stft_window(size):
+    window = np.hanning(size).astype(np.float32)
+    window.setflags(write=False)
+    return window
+
+
+def power_to_db(power, size):
+    # Scaled so a full scale sine peaks at about 0 dB
+    scale = (np.sum(stft_window(size)) / 2) ** 2
+    db = 10 * np.log10(np.maximum(power / scale, 1e-12, dtype=np.float32))
+    return np.maximum(db, SPECTROGRAM_FLOOR_DB).astype(np.float32)
+
+
+def frame_power(frames, rfft):
+    # frames: (count, size) windows of the signal, one spectrum per row
+    spectra = rfft(frames * stft_window(frames.shape[1]), axis=1)
+    return np.square(np.abs(spectra))
+
+
+class Spectrogram:
+    # dB magnitudes of a whole buffer, one row per column of the image. Frames start at
+    # sample 0 every STFT_HOP samples and the end is padded with silence. Frames are
+    # cut as strided views and transformed STFT_BATCH at a time, so memory stays flat
+    # for any length; above MAX_STFT_COLUMNS frames, groups of frames are averaged the
+    # way the peak pyramid merges buckets. Built once per buffer and cached with it.
+    # Buffers with several channels are shown as their mix.
+    def __init__(self, data, fs, progress=None, size=STFT_SIZE, hop=STFT_HOP):
+        # scipy.fft keeps float32 in single precision
+        from scipy.fft import rfft
+
+        self.fs = fs
+        self.size = size
+        self.length = len(data)
+        n_frames = -(-self.length // hop)
+        self.group = max(1, -(-n_frames // MAX_STFT_COLUMNS))
+        # Seconds covered by one column
+        self.column_step = self.group * hop / fs
+        self.db = np.full((-(-n_frames // self.group), size // 2 + 1), SPECTROGRAM_FLOOR_DB, dtype=np.float32)
+
+        batch = self.group * max(1, STFT_BATCH // self.group)
+        for first in range(0, n_frames, batch):
+            count = min(batch, n_frames - first)
+            start = first * hop
+            chunk = np.zeros((count - 1) * hop + size, dtype=np.float32)
+            piece = mix_down(data[start:start + len(chunk)])
+            chunk[:len(piece)] = piece
+            power = frame_power(sliding_window_view(chunk, size)[::hop], rfft)
+            groups = np.arange(0, count, self.group)
+            counts = np.diff(np.append(groups, count))[:, np.newaxis]
+            power = np.add.reduceat(power, groups, axis=0) / counts
+            column = first // self.group
+            self.db[column:column + len(power)] = power_to_db(power, size)
+            if progress is not None:
+                progress(100 * (first + count) / n_frames)
+
+    def __len__(self):
+        return len(self.db)
+
+    @property
+    def nbytes(self):
+        return self.db.nbytes
+
+    @property
+    def duration(self):
+        return self.length / self.fs
+
+
+class StreamingSTFT:
+    # Incremental version for the live view: blocks of any size go in and the dB
+    # columns of every frame completed by them come out, the same columns Spectrogram
+    # gives for a short buffer. The few frames per timer tick are too small for
+    # scipy's single precision to matter, numpy.fft is enough.
+    def __init__(self, size=STFT_SIZE, hop=STFT_HOP):
+        self.size = size
+        self.hop = hop
+        self.reset()
+
+    def reset(self):
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def process(self, block):
+        self.pending = np.concatenate((self.pending, mix_down(block)))
+        if len(self.pending) < self.size:
+            return np.zeros((0, self.size // 2 + 1), dtype=np.float32)
+        count = (len(self.pending) - self.size) // self.hop + 1
+        frames = sliding_window_view(self.pending, self.size)[::self.hop][:count]
+        db = power_to_db(frame_power(frames, np.fft.rfft), self.size)
+        self.pending = self.pending[count * self.hop:]
+        return db
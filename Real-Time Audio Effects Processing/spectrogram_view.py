@@ -0,0 +1,33 @@
+from plot_view import PlotView
+from spectrogram import SPECTROGRAM_FLOOR_DB
+
+
+class SpectrogramView(PlotView):
+    # Shows a cached Spectrogram with imshow. The image is only replaced, never
+    # recomputed, so switching between cached chains just swaps arrays. The playhead
+    # is blitted by PlotView like in WaveformView.
+    draw_name = "draw spectrogram"
+    y_label = "Frequency (Hz)"
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.spectrogram = None
+        self.image = None
+
+    def set_spectrogram(self, spectrogram, title):
+        self.ensure_canvas()
+        self.spectrogram = spectrogram
+        self.fs = spectrogram.fs
+        extent = (0, len(spectrogram) * spectrogram.column_step, 0, spectrogram.fs / 2)
+        # Rows of db are time, the image wants frequency on the vertical axis
+        if self.image is None:
+            self.image = self.ax.imshow(spectrogram.db.T, origin='lower', aspect='auto', extent=extent,
+                                        cmap='magma', vmin=SPECTROGRAM_FLOOR_DB, vmax=0,
+                                        interpolation='nearest')
+        else:
+            self.image.set_data(spectrogram.db.T)
+            self.image.set_extent(extent)
+        self.ax.set_xlim(0, spectrogram.duration)
+        self.ax.set_ylim(0, spectrogram.fs / 2)
+        self.ax.set_title(title)
+        self.canvas.draw_idle()
@@ -0,0 +1,149 @@
+from time import perf_counter
+
+import numpy as np
+import sounddevice as sd
+
+from pcm import channel_count
+from processors import BLOCK_SIZE
+from resample import Resampler
+
+
+def device_rate(fallback=44100):
+    # Default sample rate of the output device
+    try:
+        return int(sd.query_devices(kind='output')['default_samplerate'])
+    except (sd.PortAudioError, ValueError):
+        return fallback
+
+
+def output_rate(fs, channels=1):
+    # The source rate if the output device takes it, otherwise the device's own rate
+    try:
+        sd.check_output_settings(samplerate=fs, channels=channels, dtype='float32')
+        return fs
+    except (sd.PortAudioError, ValueError):
+        return device_rate()
+
+
+class StreamPlayer:
+    # Pulls blocks straight from the source buffer or memmap, runs them through the
+    # processor inside the sounddevice callback and writes them to the output buffer.
+    # Only when the device cannot play the source rate are the processed blocks
+    # resampled to the device rate. The stream has as many channels as the source.
+    def __init__(self, data, fs, processor, blocksize=BLOCK_SIZE, finished_callback=None, monitor=None,
+                 start=0, stats=None):
+        # Source buffer and processor are swapped together, never one without the other
+        self.source = (data, processor)
+        self.fs = fs
+        self.channels = channel_count(data)
+        self.blocksize = blocksize
+        # Next source frame to read, and a seek the callback has not picked up yet
+        self.read_position = start
+        self.seek_to = None
+        self.volume = 1.0
+        self.paused = False
+        # Optional live_view.BlockTap that gets every output block
+        self.monitor = monitor
+        # Optional profiling.CallbackStats timing every callback against its deadline
+        self.stats = stats
+        self.device_rate = output_rate(fs, self.channels)
+        self.resampler = None
+        if self.device_rate != fs:
+            self.resampler = Resampler(fs, self.device_rate, self.channels)
+            # Resampled frames that did not fit into the last callback
+            self.pending = np.zeros((0, self.channels), dtype=np.float32)
+        self.stream = sd.OutputStream(samplerate=self.device_rate, channels=self.channels, dtype='float32',
+                                      blocksize=blocksize, callback=self.callback,
+                                      finished_callback=finished_callback)
+
+    def read(self, data, processor, frames):
+        # The next `frames` source frames through the processor, zero padded past the end
+        block = data[self.read_position:self.read_position + frames]
+        n = len(block)
+        if n < frames:
+            block = np.concatenate((block, np.zeros((frames - n, self.channels), dtype=np.float32)))
+        self.read_position += n
+        return processor.process(block), n
+
+    def callback(self, outdata, frames, time, status):
+        started = perf_counter()
+        try:
+            self.fill(outdata, frames)
+        finally:
+            if self.stats is not None:
+                self.stats.record(started, perf_counter(), frames / self.device_rate, status)
+
+    def fill(self, outdata, frames):
+        data, processor = self.source
+        seek_to = self.seek_to
+        if seek_to is not None:
+            # Effect tails from the old position would be wrong at the new one
+            self.seek_to = None
+            self.read_position = seek_to
+            processor.reset()
+            if self.resampler is not None:
+                self.resampler.reset()
+                self.pending = np.zeros((0, self.channels), dtype=np.float32)
+
+        # A source that is still being decoded just plays silence until it catches up
+        complete = getattr(data, "complete", True)
+        if self.resampler is None:
+            out, n = self.read(data, processor, frames)
+            finished = n < frames and complete
+        else:
+            while len(self.pending) < frames and not (complete and self.read_position >= len(data)):
+                block, n = self.read(data, processor, self.blocksize)
+                self.pending = np.concatenate((self.pending, self.resampler.process(block)))
+                if n < self.blocksize:
+                    break
+            finished = complete and self.read_position >= len(data) and len(self.pending) <= frames
+            out = self.pending[:frames]
+            self.pending = self.pending[frames:]
+            if len(out) < frames:
+                out = np.concatenate((out, np.zeros((frames - len(out), self.channels), dtype=np.float32)))
+
+        np.multiply(out, self.volume, out=outdata)
+        if self.monitor is not None:
+            self.monitor.push(outdata)
+        if finished:
+            raise sd.CallbackStop
+
+    def set_source(self, data, processor):
+        # Both buffers must have the same length and channels, playback continues at the same position
+        self.source = (data, processor)
+
+    def seek(self, frame):
+        # Sample accurate, taken over by the callback at the start of its next block
+        data, processor = self.source
+        self.seek_to = max(0, min(int(frame), len(data)))
+
+    @property
+    def position(self):
+        # Source frame being played, not counting what is read ahead for resampling
+        if self.seek_to is not None:
+            return self.seek_to
+        if self.resampler is None:
+            return self.read_position
+        ahead = self.resampler.half + int(len(self.pending) * self.fs / self.device_rate)
+        return max(0, self.read_position - ahead)
+
+    def start(self):
+        self.paused = False
+        self.stream.start()
+
+    def pause(self):
+        self.paused = True
+        self.stream.stop()
+
+    def resume(self):
+        if self.paused:
+            self.paused = False
+            self.stream.start()
+
+    def stop(self):
+        self.stream.stop()
+        self.stream.close()
+
+    @property
+    def active(self):
+        return self.stream.active
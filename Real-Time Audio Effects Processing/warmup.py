@@ -0,0 +1,27 @@
+import importlib
+import threading
+
+# Imported on first use instead of at startup. warm_up() loads them on a background
+# thread once the window is shown, so the first plot or MP3 load does not wait.
+# The Qt backend of matplotlib is left to the GUI thread.
+HEAVY_MODULES = (
+    "scipy.signal",
+    "scipy.fft",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_agg",
+    "audioread",
+)
+
+
+def warm_up(modules=HEAVY_MODULES):
+    def run():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                # Missing optional modules only fail when the feature is used
+                pass
+
+    thread = threading.Thread(target=run, name="import-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,116 @@
+import weakref
+
+import numpy as np
+
+# Samples per bucket in the finest level of the peak pyramid
+PEAK_BASE = 256
+# Buckets of one level merged into one bucket of the next level
+PEAK_FACTOR = 4
+# Samples read at once while the pyramid is built
+PEAK_BLOCK_SIZE = PEAK_BASE * 1024
+
+
+def channel_range(block):
+    # Lowest and highest sample of every frame of a (frames, channels) block as
+    # float32, with NaN and inf drawn as 0. The overview shows all channels in one
+    # envelope.
+    block = np.nan_to_num(np.asarray(block, dtype=np.float32), nan=0.0, posinf=0.0, neginf=0.0)
+    if block.ndim == 1 or block.shape[1] == 1:
+        block = block.reshape(len(block))
+        return block, block
+    return block.min(axis=1), block.max(axis=1)
+
+
+def reduce_peaks(mins, maxs, group):
+    # Merges every `group` buckets into one, the last one may be partial
+    if group <= 1:
+        return mins, maxs
+    pad = -len(mins) % group
+    if pad:
+        mins = np.concatenate((mins, np.repeat(mins[-1:], pad)))
+        maxs = np.concatenate((maxs, np.repeat(maxs[-1:], pad)))
+    return mins.reshape(-1, group).min(axis=1), maxs.reshape(-1, group).max(axis=1)
+
+
+class PeakPyramid:
+    # Min/max overview of a buffer at several resolutions, like the peak files DAWs
+    # keep next to their audio. Level 0 holds the min and max of every PEAK_BASE
+    # samples and each further level merges PEAK_FACTOR buckets of the one below.
+    # It is built once per buffer; envelope() then costs time proportional to the
+    # requested width, not to the number of samples, and never hides a transient
+    # the way plotting every n-th sample does. The buffer itself is only referenced
+    # weakly for zoomed-in views: the pyramid is cached separately from it and must
+    # not keep an evicted buffer alive outside the cache budget. Once the buffer is
+    # gone, zooming in stops at the finest level.
+    def __init__(self, data, progress=None):
+        self.data = weakref.ref(data)
+        self.length = len(data)
+        mins = []
+        maxs = []
+        for start in range(0, self.length, PEAK_BLOCK_SIZE):
+            block = data[start:start + PEAK_BLOCK_SIZE]
+            block_mins, block_maxs = reduce_peaks(*channel_range(block), PEAK_BASE)
+            mins.append(block_mins)
+            maxs.append(block_maxs)
+            if progress is not None:
+                progress(100 * (start + len(block)) / self.length)
+
+        if mins:
+            level = (np.concatenate(mins), np.concatenate(maxs))
+        else:
+            level = (np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32))
+        self.levels = [level]
+        while len(level[0]) > 1:
+            level = reduce_peaks(level[0], level[1], PEAK_FACTOR)
+            self.levels.append(level)
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def nbytes(self):
+        return sum(mins.nbytes + maxs.nbytes for mins, maxs in self.levels)
+
+    @property
+    def min(self):
+        return float(self.levels[-1][0][0]) if self.length else 0.0
+
+    @property
+    def max(self):
+        return float(self.levels[-1][1][0]) if self.length else 0.0
+
+    def envelope(self, start, stop, width):
+        # Sample positions plus the min and max of about `width` columns covering [start, stop)
+        start = max(0, int(start))
+        stop = min(self.length, int(stop))
+        width = max(1, int(width))
+        span = stop - start
+        if span <= 0:
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty, empty
+
+        per_column = span / width
+        data = self.data()
+        if per_column < PEAK_BASE and data is not None:
+            # Zoomed in past the finest level, at most width * PEAK_BASE raw samples are read
+            group = int(np.ceil(per_column))
+            mins, maxs = reduce_peaks(*channel_range(data[start:stop]), group)
+            positions = start + np.arange(len(mins)) * group
+            return positions, mins, maxs
+
+        level = max(0, min(int(np.log(per_column / PEAK_BASE) / np.log(PEAK_FACTOR)), len(self.levels) - 1))
+        bucket = PEAK_BASE * PEAK_FACTOR ** level
+        first = start // bucket
+        last = -(-stop // bucket)
+        level_mins, level_maxs = self.levels[level]
+        group = max(1, int(np.ceil((last - first) / width)))
+        mins, maxs = reduce_peaks(level_mins[first:last], level_maxs[first:last], group)
+        positions = (first + np.arange(len(mins)) * group) * bucket
+        return positions, mins, maxs
+
+
+def envelope_line(positions, mins, maxs, fs):
+    # One polyline going down and up every column, drawn as a single Line2D
+    t = np.repeat(positions / fs, 2)
+    y = np.column_stack((mins, maxs)).ravel()
+    return t, y
@@ -0,0 +1,93 @@
+from plot_view import PlotView
+from waveform import envelope_line
+
+# Zoom step per mouse wheel notch and the smallest visible span in samples
+ZOOM_STEP = 1.25
+MIN_SPAN = 64
+
+
+class WaveformView(PlotView):
+    # Interactive waveform backed by a PeakPyramid. One Axes and one Line2D are
+    # created once and only get new data; zooming (wheel) and panning (drag) ask the
+    # pyramid for one column per pixel of the visible range, double click shows the
+    # whole buffer again. The playhead is blitted by PlotView.
+    draw_name = "draw waveform"
+    y_label = "Amplitude"
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.peaks = None
+        self.view_start = 0
+        self.view_stop = 0
+        self.drag_x = None
+
+    def ensure_canvas(self):
+        if not super().ensure_canvas():
+            return
+        self.line, = self.ax.plot([], [], color='lime', linewidth=0.8)
+        self.canvas.mpl_connect('resize_event', lambda event: self.update_line())
+        self.canvas.mpl_connect('scroll_event', self.on_scroll)
+        self.canvas.mpl_connect('button_press_event', self.on_press)
+        self.canvas.mpl_connect('motion_notify_event', self.on_motion)
+        self.canvas.mpl_connect('button_release_event', self.on_release)
+
+    def set_peaks(self, peaks, fs, title):
+        self.ensure_canvas()
+        self.peaks = peaks
+        self.fs = fs
+        self.view_start = 0
+        self.view_stop = len(peaks)
+        self.ax.set_title(title)
+        self.ax.set_ylim(peaks.min - 0.1, peaks.max + 0.1)
+        self.update_line()
+
+    def update_line(self):
+        if self.peaks is None or len(self.peaks) == 0:
+            return
+        width = max(1, int(self.ax.bbox.width))
+        positions, mins, maxs = self.peaks.envelope(self.view_start, self.view_stop, width)
+        self.line.set_data(*envelope_line(positions, mins, maxs, self.fs))
+        self.ax.set_xlim(self.view_start / self.fs, self.view_stop / self.fs)
+        # Several wheel or drag events between two frames end up in a single draw
+        self.canvas.draw_idle()
+
+    def set_view(self, start, stop):
+        length = len(self.peaks)
+        span = min(max(MIN_SPAN, stop - start), length)
+        start = min(max(0, start), length - span)
+        self.view_start = int(start)
+        self.view_stop = int(start + span)
+        self.update_line()
+
+    def playhead_shown(self, position):
+        return self.view_start <= position <= self.view_stop
+
+    def on_scroll(self, event):
+        if self.peaks is None or event.xdata is None:
+            return
+        # Zoom around the sample under the cursor
+        center = event.xdata * self.fs
+        scale = 1 / ZOOM_STEP if event.step > 0 else ZOOM_STEP
+        scale **= abs(event.step)
+        self.set_view(center - (center - self.view_start) * scale,
+                      center + (self.view_stop - center) * scale)
+
+    def on_press(self, event):
+        if self.peaks is None or event.inaxes is not self.ax:
+            return
+        if event.dblclick:
+            self.set_view(0, len(self.peaks))
+        else:
+            self.drag_x = event.x
+
+    def on_motion(self, event):
+        if self.drag_x is None or event.x is None:
+            return
+        # Pixels to samples at the current zoom
+        samples_per_pixel = (self.view_stop - self.view_start) / max(1.0, self.ax.bbox.width)
+        shift = (self.drag_x - event.x) * samples_per_pixel
+        self.drag_x = event.x
+        self.set_view(self.view_start + shift, self.view_stop + shift)
+
+    def on_release(self, event):
+        self.drag_x = None
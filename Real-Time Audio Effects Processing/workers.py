@@ -0,0 +1,70 @@
+import os
+import threading
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class TaskSignals(QObject):
+    # Created on the GUI thread, so the connected slots run there as well
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class Task(QRunnable):
+    # Runs fn(*args, progress=..., **kwargs) on the thread pool. fn reports its progress
+    # in percent through the progress callback, which raises TaskCancelled once
+    # cancel() has been called so long jobs stop at their next block.
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self.cancel_event = threading.Event()
+        self.last_percent = -1
+        # The owner keeps a reference until one of the signals has arrived
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def report_progress(self, percent):
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+        percent = int(percent)
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.signals.progress.emit(percent)
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self.report_progress, **self.kwargs)
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception:
+            self.signals.error.emit(traceback.format_exc())
+            return
+        if self.cancel_event.is_set():
+            self.signals.cancelled.emit()
+        else:
+            self.signals.finished.emit(result)
+
+
+def make_thread_pool():
+    # NumPy/SciPy release the GIL inside FFTs and filters, so one thread per core
+    # lets several renders run in parallel.
+    pool = QThreadPool()
+    pool.setMaxThreadCount(os.cpu_count() or 1)
+    return pool